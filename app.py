@@ -1,23 +1,151 @@
 # app.py
 
+from contextlib import asynccontextmanager
+
+# Time the project imports below; the report is logged when the app starts
+from utils.startup_report import startup_timer
+startup_timer.install()
+
+import asyncio
+import time
+
+import anyio.to_thread
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from starlette.concurrency import run_in_threadpool
+from twilio.twiml.messaging_response import MessagingResponse
+from config import get_settings
 from main import process_message
-from utils.logger import app_logger as logger
+from helper_functions.booking_sync import job_queue
+from utils.idempotency import IdempotencyCache
+from utils.keyed_lock import KeyedLock
+from utils.logger import app_logger as logger, configure_logging
+from utils.messaging_utils import collect_replies, dispatcher, format_mobile_for_twilio, send_whatsapp_message
+from utils.rate_limiter import SlidingWindowLimiter
+from utils.metrics import registry
+
+startup_timer.uninstall()
+settings = get_settings()
+configure_logging(settings)
+
+webhook_seconds = registry.histogram(
+    "chatbot_webhook_seconds", "Time to answer a Twilio webhook, by HTTP status code.", ("status",)
+)
+
+# Twilio retries a webhook that is slow or fails; a retry must not run the flow (and its bookings) again
+deliveries = IdempotencyCache(ttl=settings.idempotency_ttl, maxsize=settings.idempotency_size)
+
+# Messages from one user are processed one at a time, in arrival order; different users run in parallel
+user_locks = KeyedLock()
+lock_waiting = registry.gauge("chatbot_user_lock_waiting", "Messages waiting for an earlier message of the same user.")
+
+# A sender over settings.throttle_limit messages per window is delayed, dropped or told once to wait,
+# so one number (or bot) repeating "hi" cannot spend the backend capacity meant for everyone else
+inbound_limiter = SlidingWindowLimiter(settings.throttle_limit, settings.throttle_window, settings.throttle_max_senders)
+throttled_messages = registry.counter(
+    "chatbot_inbound_throttled_total", "Messages over their sender's inbound limit, by what happened (delayed, replied or dropped).", ("action",)
+)
+throttle_senders = registry.gauge("chatbot_inbound_throttle_senders", "Senders tracked by the inbound limit.")
+
+THROTTLE_MESSAGE = "You're sending messages faster than we can answer. Please wait a minute and try again."
+
+
+def process_with_replies(from_number: str, message_body: str, request_data: dict) -> tuple:
+    """
+    Runs process_message and returns (flow result, TwiML body). In TwiML reply mode the text replies to the
+    sender come back as <Message> elements; otherwise every message goes through the REST API and the body is None.
+    """
+    if settings.reply_mode != "twiml":
+        return process_message(from_number, message_body, request_data), None
+    with collect_replies(format_mobile_for_twilio(from_number)) as replies:
+        response = process_message(from_number, message_body, request_data)
+    return response, replies.twiml()
+
+
+def reply_throttled(from_number: str) -> tuple:
+    """Tells a throttled sender once to wait; the message itself is not processed."""
+    response = {"status": "throttled", "message": THROTTLE_MESSAGE}
+    to = format_mobile_for_twilio(from_number)
+    if settings.reply_mode == "twiml":
+        with collect_replies(to) as replies:
+            send_whatsapp_message(to, body=THROTTLE_MESSAGE)
+        return response, replies.twiml()
+    send_whatsapp_message(to, body=THROTTLE_MESSAGE)
+    return response, None
+
+
+async def throttle_or_process(from_number: str, message_body: str, request_data: dict) -> tuple:
+    """
+    Applies the sender's inbound limit, then processes the message in order.
+    Over the limit, settings.throttle_action decides: "delay" holds the message until the window frees up
+    (at most throttle_delay_max seconds), "reply" sends one "please wait" per window, anything else drops it.
+    """
+    if settings.throttle_limit <= 0 or inbound_limiter.hit(from_number):
+        return await process_in_order(from_number, message_body, request_data)
+
+    if settings.throttle_action == "delay":
+        # Take the user's place in line before waiting, so delayed messages keep their arrival order
+        async with user_locks.hold(from_number):
+            wait = inbound_limiter.retry_after(from_number)
+            if wait <= settings.throttle_delay_max:
+                await asyncio.sleep(wait)
+                if inbound_limiter.hit(from_number):
+                    throttled_messages.inc(action="delayed")
+                    return await run_in_threadpool(process_with_replies, from_number, message_body, request_data)
+    elif settings.throttle_action == "reply" and inbound_limiter.notify_once(from_number):
+        throttled_messages.inc(action="replied")
+        logger.warning(f"Throttled {from_number}: over {settings.throttle_limit} messages in {settings.throttle_window:g}s")
+        return await run_in_threadpool(reply_throttled, from_number)
+
+    throttled_messages.inc(action="dropped")
+    logger.debug("Dropped a message from throttled sender %s", from_number)
+    twiml = str(MessagingResponse()) if settings.reply_mode == "twiml" else None
+    return {"status": "throttled", "message": THROTTLE_MESSAGE}, twiml
+
+
+async def process_in_order(from_number: str, message_body: str, request_data: dict) -> tuple:
+    """
+    Runs process_with_replies for one user at a time. Holding the lock inside the deduplicated task
+    keeps it held for as long as the flow runs, even if the webhook request that started it goes away.
+    """
+    async with user_locks.hold(from_number):
+        return await run_in_threadpool(process_with_replies, from_number, message_body, request_data)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Sizes the worker thread pool that runs the conversation flows, resumes background jobs left
+    from the last run, and drains the outbound message and job queues on shutdown.
+    Each in-flight message holds one thread while it waits on backend I/O,
+    so the pool size is the number of conversations a single worker can serve at once.
+    """
+    logger.info(startup_timer.report())
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = settings.worker_threads
+    logger.info(f"Conversation worker threads: {limiter.total_tokens}")
+    await anyio.to_thread.run_sync(job_queue.start)
+    yield
+    await anyio.to_thread.run_sync(dispatcher.stop, settings.send_timeout)
+    await anyio.to_thread.run_sync(job_queue.stop, settings.send_timeout)
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.post("/chatbot")
 async def chatbot_flow(request: Request):
     """
     Chatbot endpoint to handle incoming messages with optional media upload.
     """
+    started = time.perf_counter()
+    status = 500
     try:
         # Parse incoming request data
         body = await request.form()
         from_number = body.get("From", "")
         message_body = body.get("Body", "")
         media_url = body.get("MediaUrl0", "")  # URL for uploaded media
+        message_sid = body.get("MessageSid", "")
 
         # Prepare request_data for the message processor
         request_data = {"MediaUrl0": media_url}
@@ -25,12 +153,33 @@ async def chatbot_flow(request: Request):
         # Log received message and media
         logger.info(f"Received message from: {from_number}, Body: {message_body}, Media URL: {media_url}")
 
-        # Process the messagec
-        response = process_message(from_number, message_body, request_data)
+        # Process the message off the event loop; the flows block on backend and Twilio calls.
+        # Retries of the same MessageSid get the first delivery's result (and replies) instead of reprocessing,
+        # and don't count against the sender's inbound limit.
+        response, twiml = await deliveries.run(message_sid, lambda: throttle_or_process(from_number, message_body, request_data))
 
         # Log and return the response
         logger.info(f"Response generated successfully for {from_number}")
+        status = 200
+        if twiml is not None:
+            # Twilio delivers the <Message> replies; the flow status is kept in a header for logs and load tests
+            return Response(twiml, media_type="application/xml", headers={"X-Chatbot-Status": str((response or {}).get("status", ""))})
         return JSONResponse(content=response)
     except Exception as e:
         logger.error(f"Error occurred while processing message: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        webhook_seconds.observe(time.perf_counter() - started, status=status)
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus scrape endpoint: backend, Twilio, webhook and per-step latency plus state-store size.
+    Rendered off the event loop because counting conversations walks the state store.
+    The user locks and the inbound limiter belong to the event loop, so their gauges are read here first.
+    """
+    lock_waiting.set(user_locks.waiting())
+    throttle_senders.set(len(inbound_limiter))
+    body = await run_in_threadpool(registry.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -4,10 +4,9 @@
 from config import load_config
 from datetime import datetime, date
 
-from twilio.rest import Client
 
 from utils.logger import app_logger as logger
-from utils.messaging_utils import send_whatsapp_message, format_mobile_for_twilio
+from utils.messaging_utils import send_whatsapp_message, format_mobile_for_twilio, PRIORITY_LOW
 from helper_functions.add_patient_api import add_patient_to_api
 from state.state_manager import user_registration_state
 
@@ -20,19 +19,12 @@ update_nationality_api = config['update_nationality_api']
 booking_api_presc = config['booking_presc_api']
 booking_list = config['booking_list']
 
-# Load Twilio configuration
-account_sid = config['account_sid']
-auth_token = config['auth_token']
-twilio_whatsapp_number = config['phone_number']
-
 # Twilio SID
 someone_else_relationship = config['someone_else_relationship']
 patient_nationality_someone = config['patient_nationality_someone']
 someone_else_gender = config['someone_else_gender']
 
 
-# Initiate Twilio Client
-client = Client(account_sid, auth_token)
 
 def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None) -> dict:
 
@@ -42,7 +34,7 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
             "step":"ask_relationship"
         }
     state = user_registration_state[mobile_api]
-    logger.debug(f"Current state for {mobile_api}: {state}")
+    logger.debug("Current state for %s: %s", mobile_api, state)
 
     
 
@@ -56,13 +48,9 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
             logger.info(f"Sending Relationship Quick Reply for {mobile_api}")
 
             try:
-                sid_message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=mobile_twilio,
-                    content_sid=someone_else_relationship  
-                )
-                logger.info(f"Relationship selection template sent to {mobile_twilio} with SID: {sid_message.sid}")
-                return {"status": "success", "message_sid": sid_message.sid}
+                send_whatsapp_message(mobile_twilio, content_sid=someone_else_relationship)
+                logger.info(f"Relationship selection template sent to {mobile_twilio}")
+                return {"status": "success", "message": "Quick reply template sent."}
             except Exception as e:
                 logger.error(f" Failed to send relationship options to {mobile_twilio}: {e}")
                 return {"status": "error", "error": str(e)}
@@ -84,13 +72,9 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
 
             # Resend the relationship options
             try:
-                sid_message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=mobile_twilio,
-                    content_sid=someone_else_relationship  
-                )
-                logger.info(f"Relationship selection template sent to {mobile_twilio} with SID: {sid_message.sid}")
-                return {"status": "success", "message_sid": sid_message.sid}
+                send_whatsapp_message(mobile_twilio, content_sid=someone_else_relationship, priority=PRIORITY_LOW)
+                logger.info(f"Relationship selection template sent to {mobile_twilio}")
+                return {"status": "success", "message": "Quick reply template sent."}
             except Exception as e:
                 logger.error(f" Failed to send relationship options to {mobile_twilio}: {e}")
                 return {"status": "error", "error": str(e)}
@@ -101,12 +85,12 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
         state = user_registration_state[mobile_api]
 
         # Log the state before and after updating `user_registration_state`
-        logger.debug(f"Before saving, state for {mobile_api}: {state}")
+        logger.debug("Before saving, state for %s: %s", mobile_api, state)
 
         #  Save the updated state
         state = user_registration_state[mobile_api]
 
-        logger.debug(f"Current state for {mobile_api}: {user_registration_state[mobile_api]}")
+        logger.debug("Current state for %s: %s", mobile_api, user_registration_state[mobile_api])
         send_whatsapp_message(mobile_twilio, body="Please enter their full name (e.g., John Doe):")
         return {"status": "success", "message": "Requesting Name"}
 
@@ -144,18 +128,14 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
 
 
         state["step"] = "ask_other_person_nationality"
-        logger.debug(f"State updated to: {state}")
+        logger.debug("State updated to: %s", state)
 
         try:
             to = format_mobile_for_twilio(mobile_twilio)
 
-            message = client.messages.create(
-                from_= twilio_whatsapp_number,
-                to = to,
-                content_sid = patient_nationality_someone
-            )
+            send_whatsapp_message(to, content_sid=patient_nationality_someone)
             logger.info(f"Quick reply sent to {to}")
-            return {"status":"success", "message_sid":message.sid}
+            return {"status": "success", "message": "Quick reply template sent."}
         except ValueError as ve:
             logger.error(f"Invalid number provided: {ve}")
             return {"status": "error", "error": str(ve)}
@@ -176,13 +156,13 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
         if nationality == "Yes":
             state["nationality"] = "Saudi"
             state["step"] = "ask_other_person_dob"
-            logger.debug(f"State updated to: {state}")
+            logger.debug("State updated to: %s", state)
             send_whatsapp_message(mobile_twilio, body="Please enter their date of birth (DD/MM/YYYY):")
             return {"status": "success", "message": "Requesting DOB"}
 
         elif nationality == "No":
             state["step"] = "ask_other_person_custom_nationality"
-            logger.debug(f"State updated to: {state}")
+            logger.debug("State updated to: %s", state)
             send_whatsapp_message(mobile_twilio, body="Please specify their nationality:")
             return {"status": "success", "message": "Requesting custom nationality"}
 
@@ -205,7 +185,7 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
         state["nationality"] = custom_nationality
 
         state["step"] = "ask_other_person_dob"
-        logger.debug(f"State updated to: {state}")
+        logger.debug("State updated to: %s", state)
         send_whatsapp_message(mobile_twilio, body="Please enter their date of birth (DD/MM/YYYY):")
         return {"status": "success", "message": "Requesting DOB"}
 
@@ -220,7 +200,7 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
 
         try:
             normalized_dob = dob.replace("-", "/")
-            logger.debug(f"DOB normalized: {normalized_dob}")
+            logger.debug("DOB normalized: %s", normalized_dob)
             parsed_dob = datetime.strptime(normalized_dob, "%d/%m/%Y").date()
 
             if parsed_dob > date.today():
@@ -242,18 +222,14 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
 
 
             state["step"] = "ask_other_person_gender"
-            logger.debug(f"State updated to: {state}")
+            logger.debug("State updated to: %s", state)
 
             try:
                 to = format_mobile_for_twilio(mobile_twilio)
 
-                message = client.messages.create(
-                    from_ = twilio_whatsapp_number,
-                    to = to,
-                    content_sid=someone_else_gender
-                )
-                logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-                return {"status": "success", "message_sid": message.sid}
+                send_whatsapp_message(to, content_sid=someone_else_gender)
+                logger.info(f"Quick reply template sent to {to}")
+                return {"status": "success", "message": "Quick reply template sent."}
             except ValueError as ve:
                 logger.error(f"Invalid mobile number provided: {ve}")
                 return {"status": "error", "error": str(ve)}
@@ -276,13 +252,9 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
             try:
                 to = format_mobile_for_twilio(mobile_twilio)
 
-                message = client.messages.create(
-                    from_ = twilio_whatsapp_number,
-                    to = to,
-                    content_sid=someone_else_gender
-                )
-                logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-                return {"status": "success", "message_sid": message.sid}
+                send_whatsapp_message(to, content_sid=someone_else_gender)
+                logger.info(f"Quick reply template sent to {to}")
+                return {"status": "success", "message": "Quick reply template sent."}
             except ValueError as ve:
                 logger.error(f"Invalid mobile number provided: {ve}")
                 return {"status": "error", "error": str(ve)}
@@ -297,7 +269,7 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
         )
         state["gender"] = gender_replacement
         state["step"] = "ask_other_person_mobile"
-        logger.debug(f"State updated to: {state}")
+        logger.debug("State updated to: %s", state)
         send_whatsapp_message(mobile_twilio, body="Please enter their 10-digit mobile number:")
         return {"status": "success", "message": "Requesting mobile number"}
 
@@ -313,7 +285,7 @@ def add_family_member(mobile_api: str, mobile_twilio: str, message: str = None)
         state["mobile"] = mobile_no
         return add_patient_to_api(mobile_api, mobile_twilio, state)
 
-    logger.error(f"Unhandled step in state for {mobile_api}: {state}")
+    logger.error("Unhandled step in state for %s: %s", mobile_api, state)
     return {"status": "error", "message": "Unhandled step"}
 
 
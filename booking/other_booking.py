@@ -2,29 +2,21 @@
 
 import requests
 from config import load_config
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
-from twilio.rest import Client
-from requests.auth import HTTPBasicAuth
+from datetime import datetime
 from utils.logger import app_logger as logger
-from utils.messaging_utils import send_whatsapp_message, format_mobile_for_twilio
+from utils.api_client import backend_client
+from utils.messaging_utils import send_whatsapp_message, format_mobile_for_twilio, PRIORITY_HIGH, PRIORITY_LOW
 from helper_functions.add_patient_api import add_patient_to_api
 from state.state_manager import user_registration_state
-from new_user.view_pt_det import fetch_patient_details
-from helper_functions.service_booking import handle_patient_details, save_booking_to_db
+from helper_functions.service_booking import handle_patient_details, get_patient_snapshot
+from helper_functions.media import download_prescription_image, MediaTooLargeError, MultipartStream
+from helper_functions.slot_catalog import slot_catalog, IST
+from helper_functions.booking_index import invalidate_bookings
+from helper_functions.booking_sync import queue_booking_sync
 from booking.add_family import add_family_member
 config = load_config()
 
-# External api configs
-add_patient_api = config['add_patient']
-update_nationality_api = config['update_nationality_api']
-booking_api_presc = config['booking_presc_api']
-booking_list = config['booking_list']
-
 # Load Twilio configuration
-account_sid = config['account_sid']
-auth_token = config['auth_token']
-twilio_whatsapp_number = config['phone_number']
 
 # Twilio SID
 someone_else_relationship = config['someone_else_relationship']
@@ -38,8 +30,6 @@ morning_slot_sid = config['morning_slot_sid']
 afternoon_slot_sid = config['afternoon_slot_sid']
 evening_slot_sid = config['evening_slot_sid']
 
-# Initiate Twilio Client
-client = Client(account_sid, auth_token)
 
 
 
@@ -57,7 +47,7 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
 
     
     state = user_registration_state.get(mobile_api, {"step": "show_patient_list"})
-    logger.debug(f"Current state for {mobile_api}: {state}")
+    logger.debug("Current state for %s: %s", mobile_api, state)
 
 
 
@@ -68,24 +58,20 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
         # Fetch and display the patient list
         patient_details_response = handle_patient_details(mobile_api, mobile_twilio)
         state["step"] = "patient_selection"
-        logger.debug(f" Updated state for {mobile_api}: {state}")
+        logger.debug(" Updated state for %s: %s", mobile_api, state)
 
         if patient_details_response["status"] == "error":
             user_registration_state[mobile_api]["action"] = "family_member_booking"  
             user_registration_state[mobile_api]["step"] = "ask_relationship"
-            logger.debug(f"Updated state for {mobile_api}: {user_registration_state[mobile_api]}")
+            logger.debug("Updated state for %s: %s", mobile_api, user_registration_state[mobile_api])
             return add_family_member(mobile_api, mobile_twilio, message)
         
         try:
             to = format_mobile_for_twilio(mobile_twilio)
-            message = client.messages.create(
-                from_=twilio_whatsapp_number,
-                to=to,
-                content_sid = add_family_patient
-            )
+            send_whatsapp_message(to, content_sid=add_family_patient)
 
-            logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-            return {"status": "success","sid": message.sid}
+            logger.info(f"Quick reply template sent to {to}")
+            return {"status": "success", "message": "Quick reply template sent."}
         except ValueError as ve:
             logger.error(f"Invalid mobile number provided: {ve}")
             return {"status": "error", "error": str(ve)}
@@ -100,7 +86,7 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
         
     elif state["step"] == "patient_selection":
         user_input = message.lower().strip()
-        logger.debug(f"User selected {user_input}")
+        logger.debug("User selected %s", user_input)
         if user_input == "add patient":
             logger.info(f"Redirecting {mobile_api} to Add family member flow")
             user_registration_state[mobile_api]["action"] = "family_member_booking"
@@ -110,12 +96,11 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
 
         try:
             selected_index = int(message.strip()) - 1  # Convert serial number to index
-            patient_list = fetch_patient_details(mobile_api, mobile_twilio, user_registration_state[mobile_api]).get("Message", [])[0].get("Patient_Detail", [])
+            patient_codes = get_patient_snapshot(mobile_api, mobile_twilio, state)
 
 
-            if 0 <= selected_index < len(patient_list):
-                selected_patient = patient_list[selected_index]
-                patient_id = selected_patient.get("Pt_Code", "N/A")
+            if 0 <= selected_index < len(patient_codes):
+                patient_id = patient_codes[selected_index]
 
                 state["action"] = "other_booking"
                 state["patient_code"] = patient_id
@@ -125,14 +110,10 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                 # Send the Booking option menu
                 try:
                     to = format_mobile_for_twilio(mobile_twilio)
-                    message = client.messages.create(
-                        from_=twilio_whatsapp_number,
-                        to=to,
-                        content_sid = booking_options_sid
-                    )
+                    send_whatsapp_message(to, content_sid=booking_options_sid)
 
-                    logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-                    return {"status": "success","sid": message.sid}
+                    logger.info(f"Quick reply template sent to {to}")
+                    return {"status": "success", "message": "Quick reply template sent."}
                 except ValueError as ve:
                     logger.error(f"Invalid mobile number provided: {ve}")
                     return {"status": "error", "error": str(ve)}
@@ -163,14 +144,10 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
 
             try:
                 to = format_mobile_for_twilio(mobile_twilio)
-                message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=to,
-                    content_sid = booking_options_sid
-                )
+                send_whatsapp_message(to, content_sid=booking_options_sid)
 
-                logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-                return {"status": "success", "message_sid": message.sid}
+                logger.info(f"Quick reply template sent to {to}")
+                return {"status": "success", "message": "Quick reply template sent."}
             except ValueError as ve:
                 logger.error(f"Invalid mobile number provided: {ve}")
                 return {"status": "error", "error": str(ve)}
@@ -186,7 +163,7 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
         )
         
         state["booking_type"] = booking_type_replacement
-        logger.debug(f"Booking type saved for {mobile_api}: {state['booking_type']}")
+        logger.debug("Booking type saved for %s: %s", mobile_api, state['booking_type'])
 
         state["step"] = "visit_date"
         logger.info(f"Booking type saved for {mobile_api}: {booking_type}")
@@ -226,13 +203,9 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                     to = format_mobile_for_twilio(mobile_twilio)
 
                     # Send the quick reply template using content SID
-                    message = client.messages.create(
-                        from_=twilio_whatsapp_number,
-                        to=to,
-                        content_sid=day_slot_sid
-                    )
-                    logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-                    return {"status": "success", "message_sid": message.sid}
+                    send_whatsapp_message(to, content_sid=day_slot_sid)
+                    logger.info(f"Quick reply template sent to {to}")
+                    return {"status": "success", "message": "Quick reply template sent."}
                 except ValueError as ve:
                     logger.error(f"Invalid mobile number provided: {ve}")
                     return {"status": "error", "error": str(ve)}
@@ -266,13 +239,9 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                     to = format_mobile_for_twilio(mobile_twilio)
 
                     # Send the quick reply template using content SID
-                    message = client.messages.create(
-                        from_=twilio_whatsapp_number,
-                        to=to,
-                        content_sid=day_slot_sid
-                    )
-                    logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-                    return {"status": "success", "message_sid": message.sid}
+                    send_whatsapp_message(to, content_sid=day_slot_sid)
+                    logger.info(f"Quick reply template sent to {to}")
+                    return {"status": "success", "message": "Quick reply template sent."}
                 except ValueError as ve:
                     logger.error(f"Invalid mobile number provided: {ve}")
                     return {"status": "error", "error": str(ve)}
@@ -286,6 +255,19 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                 day_message = message.strip().lower()
 
                 if day_message in ["morning", "afternoon", "evening"]:
+                    # Skip the slot list when every slot of the period has already ended;
+                    # without a usable visit date the check is left to the slot step
+                    try:
+                        visit_date = datetime.strptime(state.get("visit_date", ""), "%Y/%m/%d").date()
+                    except ValueError:
+                        logger.warning(f"No valid visit date for {mobile_api}, skipping the slots-left check.")
+                        visit_date = None
+                    if visit_date is not None and not slot_catalog.bookable(day_message, visit_date):
+                        response_message = f"No {day_message} slots are left for that date. Please choose another time of day."
+                        send_whatsapp_message(mobile_twilio, body=response_message)
+                        send_whatsapp_message(mobile_twilio, content_sid=day_slot_sid)
+                        return {"status": "error", "message": response_message}
+
                     state["selected_period"] = day_message
                     state["step_detail"] = "choose_slot"
 
@@ -298,11 +280,7 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                         content_sid = evening_slot_sid  # Evening slots Content SID
 
                     # Trigger Twilio Content Builder template
-                    client.messages.create(
-                        from_=twilio_whatsapp_number,
-                        to=mobile_twilio,
-                        content_sid=content_sid
-                    )
+                    send_whatsapp_message(mobile_twilio, content_sid=content_sid)
                     logger.info(f"Slots sent via Twilio Content Builder for {day_message.capitalize()} period.")
                     return {"status": "success", "message": f"Slots sent for {day_message.capitalize()}."}
 
@@ -319,47 +297,15 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                     # Validate slot selection based on the slot text
                     selected_item_id = message.strip()  # The slot selected by the user (e.g., "2 PM to 4 PM")
 
-                    # Slot mappings for each time period
-                    slot_mappings = {
-                        "morning": {
-                            "1": "7 AM to 8 AM",
-                            "2": "8 AM to 9 AM",
-                            "3": "9 AM to 10 AM",
-                            "4": "10 AM to 11 AM",
-                            "5": "11 AM to 12 PM"
-                        },
-                        "afternoon": {
-                            "1": "12 PM to 1 PM",
-                            "2": "1 PM to 2 PM",
-                            "3": "2 PM to 3 PM",
-                            "4": "3 PM to 4 PM",
-                            "5": "4 PM to 5 PM",
-                            "6": "5 PM to 6 PM"
-                        },
-                        "evening": {
-                            "1": "6 PM to 7 PM",
-                            "2": "7 PM to 8 PM",
-                            "3": "8 PM to 9 PM",
-                            "4": "9 PM to 10 PM",
-                            "5": "10 PM to 11 PM"
-                        }
-                    }
-
-                    # Get slots for the selected period
+                    # Look up the slot in the shared catalog
                     selected_period = state.get("selected_period", "")
-                    period_slots = slot_mappings.get(selected_period, {})  # Get the slot mapping for the selected period
-
+                    slot = slot_catalog.get(selected_period, selected_item_id)
 
-                    # Map the Item ID to the actual slot name
-                    mapped_slot = period_slots.get(selected_item_id, None)
-
-
-
-                    if mapped_slot:
-                        selected_slot = mapped_slot  # Use the mapped slot for further processing
+                    if slot:
+                        selected_slot = slot.label  # Use the mapped slot for further processing
                     else:
                         # Handle invalid Item ID
-                        logger.error(f"Invalid Item ID received: '{selected_item_id}'. Mapping: {period_slots}")
+                        logger.error(f"Invalid Item ID received: '{selected_item_id}'. Period: '{selected_period}'")
                         response_message = "Invalid selection. Please choose a valid slot from the list."
                         send_whatsapp_message(mobile_twilio, body=response_message)
                         return {"status": "error", "message": response_message}
@@ -368,75 +314,30 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                     # Validate the selected slot with both date and time
                     visit_date_str = state.get("visit_date", "")  # Get the visit date from the state
                     visit_date = datetime.strptime(visit_date_str, "%Y/%m/%d").date()  # Convert visit date to a datetime object
+                    current_time = datetime.now(IST)
+
+                    # Slot start + 40 minutes, or now + 40 minutes inside a slot already running today
+                    visit_time_ist = slot_catalog.visit_time(slot, visit_date, current_time)
+                    logger.debug("Visit Date: %s, Current Time: %s, Slot: %s, Visit Time: %s", visit_date, current_time, slot, visit_time_ist)
+
+                    if visit_time_ist is None:
+                        # The slot has already passed today
+                        logger.error(
+                            f"Current time '{current_time.strftime('%I:%M %p')}' is outside the range of the selected slot: "
+                            f"{selected_slot} ({slot.start.strftime('%I:%M %p')} - {slot.end.strftime('%I:%M %p')})."
+                        )
+                        response_message = (
+                            f"The current time is '{current_time.strftime('%I:%M %p')}'. The selected slot '{selected_slot}' has passed. "
+                            "Please choose a valid slot."
+                        )
+                        send_whatsapp_message(mobile_twilio, body=response_message)
 
+                        # Resend the content SID for the period selection
+                        state["step_detail"] = "choose_period"  # Reset the step to period selection
 
-                    # Define the India timezone
-                    india_timezone = ZoneInfo("Asia/Kolkata")
-                    current_time = datetime.now(india_timezone)
-                    current_date = current_time.date()  # Extract current date
-
-
-                    # Extract the start and end times of the slot
-                    start_time_12hr = selected_slot.split(" ")[0] + " " + selected_slot.split(" ")[1]  # e.g., "9 AM"
-                    end_time_12hr = selected_slot.split(" ")[3] + " " + selected_slot.split(" ")[4]  # e.g., "11 AM"
-
-
-                    # Parse the start and end times as naive datetime objects
-                    start_time_naive = datetime.strptime(start_time_12hr, "%I %p")  # E.g., "9 AM"
-                    end_time_naive = datetime.strptime(end_time_12hr, "%I %p")  # E.g., "11 AM"
-
-
-                    # Combine with visit date and localize to India timezone
-                    start_time_ist = datetime.combine(visit_date, start_time_naive.time(), india_timezone)
-                    end_time_ist = datetime.combine(visit_date, end_time_naive.time(), india_timezone)
-
-
-                    # Debugging: Log the current date and slot times
-                    logger.debug(f"Visit Date: {visit_date}, Current Date: {current_date}")
-                    logger.debug(f"Slot Start Time (IST): {start_time_ist}, Slot End Time (IST): {end_time_ist}")
-
-
-                    # Validate the slot based on the date and time
-                    if visit_date == current_date:
-
-
-
-                        # If visit date is today, validate based on the current time
-                        if current_time < start_time_ist:
-                            # Case 1: Slot is in the future; add 40 minutes to the slot's start time
-                            visit_time_ist = (start_time_ist + timedelta(minutes=40)).strftime("%H:%M")
-                            logger.info(f"Future slot selected for today. Visit time set to: {visit_time_ist}")
-                        elif start_time_ist <= current_time <= end_time_ist:
-                            # Case 2: Slot is near or within the current time; add 40 minutes to the current time
-                            visit_time_ist = (current_time + timedelta(minutes=40)).strftime("%H:%M")
-                            logger.info(f"Slot is within the valid time range. Visit time set to: {visit_time_ist}")
-                        else:
-                            # Case 3: Slot has already passed
-                            logger.error(
-                                f"Current time '{current_time.strftime('%I:%M %p')}' is outside the range of the selected slot: "
-                                f"{selected_slot} ({start_time_ist.strftime('%I:%M %p')} - {end_time_ist.strftime('%I:%M %p')})."
-                            )
-                            response_message = (
-                                f"The current time is '{current_time.strftime('%I:%M %p')}'. The selected slot '{selected_slot}' has passed. "
-                                "Please choose a valid slot."
-                            )
-                            send_whatsapp_message(mobile_twilio, body=response_message)
-
-                            # Resend the content SID for the period selection
-                            state["step_detail"] = "choose_period"  # Reset the step to period selection
-
-                            client.messages.create(
-                                from_=twilio_whatsapp_number,
-                                to=mobile_twilio,
-                                content_sid=day_slot_sid  # Resend the day slot selection template
-                            )
-                            return {"status": "error", "message": response_message}
-
-
-                    else:
-                        # Case 4: Visit date is in the future
-                        logger.info(f"Future date selected: {visit_date}. Using slot start time for calculation.")
-                        visit_time_ist = (start_time_ist + timedelta(minutes=40)).strftime("%H:%M")
+                        send_whatsapp_message(mobile_twilio, content_sid=day_slot_sid, priority=PRIORITY_LOW)
+                        return {"status": "error", "message": response_message}
+                    logger.info(f"Visit time set to {visit_time_ist} for slot {selected_slot} on {visit_date}")
 
 
                     # Save the processed time in the state
@@ -474,31 +375,19 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
         
 
         prescription_image = request_data.get("MediaUrl0", "")
-        logger.debug(f"Received request data: {request_data}")
+        logger.debug("Received request data: %s", request_data)
 
         if not prescription_image:
             response_message = "No image detected. Please upload the prescription image."
             send_whatsapp_message(mobile_twilio, body=response_message)
             return {"status": "error", "message": response_message}
 
+        prescription_file = None
         try:
 
-            # Attempt to download the file
+            # Stream the file from Twilio into a spooled temporary file
             try:
-                image_response = requests.get(
-                    prescription_image,
-                    auth=HTTPBasicAuth(account_sid, auth_token)
-                )
-                image_response.raise_for_status()
-
-                # Validate content type to ensure it's an image
-                content_type = image_response.headers.get("Content-Type", "")
-                if not content_type.startswith("image/"):
-                    raise ValueError("Invalid file type uploaded. Expected an image.")
-
-                # Extract and save file extension and content
-                file_extension = content_type.split("/")[-1].lower()
-                state["prescription_image_content"] = image_response.content
+                prescription_file, file_extension = download_prescription_image(prescription_image)
                 state["file_extension"] = file_extension
 
                 logger.info(f"Prescription image validated successfully for user {mobile_api}.")
@@ -508,6 +397,14 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                 response_message = "Failed to download the prescription image. Please try uploading again."
                 send_whatsapp_message(mobile_twilio, body=response_message)
                 return {"status": "error", "message": response_message}
+            except MediaTooLargeError as e:
+                logger.warning(f"Prescription image too large for user {mobile_api}: {e}")
+                response_message = (
+                    f"The image is too large. Please upload a prescription image under "
+                    f"{config['media_max_bytes'] // (1024 * 1024)} MB."
+                )
+                send_whatsapp_message(mobile_twilio, body=response_message)
+                return {"status": "error", "message": response_message}
             except ValueError as e:
                 logger.warning(f"Invalid file type uploaded by user {mobile_api}: {e}")
                 response_message = (
@@ -530,31 +427,29 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                 "Client_Type": "P",
                 "File_Extension1": state["file_extension"],
             }
-            files = {
-                "Prescription_File1": (
-                    f"prescription.{state['file_extension']}",
-
-                    state["prescription_image_content"],
-
-                    f"image/{state['file_extension']}"
-                )
-            }
+            body = MultipartStream(
+                payload,
+                "Prescription_File1",
+                f"prescription.{state['file_extension']}",
+                prescription_file,
+                f"image/{state['file_extension']}"
+            )
 
             # Submit booking to API
             try:
-                response = requests.post(
-                    booking_api_presc,
-                    data=payload,
-                    files=files
+                response = backend_client.post(
+                    "booking_presc_api",
+                    data=body,
+                    headers={"Content-Type": body.content_type}
                 )
-                logger.info(f"Request URL: {booking_api_presc}")
-                logger.info(f"Request Payload: {payload}")
+                logger.info(f"Request URL: {backend_client.url('booking_presc_api')}")
+                logger.info("Request Payload: %s", payload)
 
                 response.raise_for_status()
                 api_response = response.json()
 
                 logger.info(f"API Response Status Code: {response.status_code}")
-                logger.info(f"API Response Body: {response.text}")
+                logger.info("API Response Body: %s", response.text)
 
                 if response.status_code == 200 and api_response.get("SuccessFlag") == "true":
                     # Extract Booking Number
@@ -564,37 +459,13 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                         "You'll receive the invoice shortly.😊\n"
                             "Type *Hi* to start the conversation."
                     )
-                    send_whatsapp_message(mobile_twilio, body=response_message)
+                    send_whatsapp_message(mobile_twilio, body=response_message, priority=PRIORITY_HIGH)
                     logger.info(f"Booking successful for user {mobile_api}. Booking Number: {booking_no}")
+                    # The user's booking index no longer lists everything
+                    invalidate_bookings(mobile_api)
 
-
-                    # Fetch additional booking details from booking_list for backend saving
-                    try:
-
-
-                        fetch_payload = {"Username": mobile_api}
-                        fetch_response = requests.post(booking_list, json=fetch_payload)
-                        fetch_response.raise_for_status()
-
-                        fetch_data = fetch_response.json()
-
-                        if fetch_data.get("SuccessFlag") == "true" and fetch_data.get("Code") == 200:
-
-
-                            # Save the booking_list response to MongoDB
-                            save_fetched_result = save_booking_to_db(fetch_data)
-                            if save_fetched_result["status"] == "success":
-                                logger.info(f"Fetched and saved booking details for {mobile_api}")
-                            else:
-                                logger.error(f"Failed to save fetched booking details for {mobile_api}")
-                        else:
-                            logger.warning(f"Failed to fetch booking details for user {mobile_api}: {fetch_data}")
-
-
-
-                    except requests.RequestException as e:
-                        logger.error(f"Error while fetching booking details for user {mobile_api}: {e}")
-
+                    # Fetch the booking_list and save it to the database in the background (retried on failure)
+                    queue_booking_sync(mobile_api)
 
                     # Clear user state
                     del user_registration_state[mobile_api]
@@ -604,7 +475,7 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
                     error_desc = api_response.get("Message", [{}])[0].get("Description", "Booking failed.")
                     response_message = "Booking failed. Please type 'Hi' to restart the conversation."
                     logger.error(f"Booking API failed for user {mobile_api}. Error: {error_desc}")
-                    send_whatsapp_message(mobile_twilio, body=response_message)
+                    send_whatsapp_message(mobile_twilio, body=response_message, priority=PRIORITY_HIGH)
                     return {"status": "error", "message": response_message}
 
 
@@ -612,12 +483,12 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
             except requests.RequestException as e:
                 logger.error(f"Error connecting to Booking API for user {mobile_api}: {e}")
                 response_message = "Unable to connect to the server. Please try again later."
-                send_whatsapp_message(mobile_twilio, body=response_message)
+                send_whatsapp_message(mobile_twilio, body=response_message, priority=PRIORITY_HIGH)
                 return {"status": "error", "message": response_message}
             except ValueError as e:
                 logger.error(f"Invalid JSON response from Booking API for user {mobile_api}: {e}")
                 response_message = "Unexpected server response. Please try again later."
-                send_whatsapp_message(mobile_twilio, body=response_message)
+                send_whatsapp_message(mobile_twilio, body=response_message, priority=PRIORITY_HIGH)
                 return {"status": "error", "message": response_message}
 
 
@@ -625,8 +496,12 @@ def add_patient_flow_others(mobile_api: str, mobile_twilio: str, message: str =
         except Exception as e:
             logger.error(f"Unexpected error during prescription upload for user {mobile_api}: {e}")
             response_message = "Something went wrong. Please try again later."
-            send_whatsapp_message(mobile_twilio, body=response_message)
+            send_whatsapp_message(mobile_twilio, body=response_message, priority=PRIORITY_HIGH)
             return {"status": "error", "message": response_message}
+        finally:
+            # The temporary file is released as soon as this step ends, whatever the outcome
+            if prescription_file is not None:
+                prescription_file.close()
 
 
     # # Unexpected input or state
@@ -3,11 +3,12 @@
 import requests
 from config import load_config
 
-from twilio.rest import Client
 from booking.other_booking import add_patient_flow_others
 
 
 from utils.logger import app_logger as logger
+from utils.api_client import backend_client
+from utils.fanout import fan_out
 from utils.messaging_utils import send_whatsapp_message, format_mobile_for_twilio
 
 from helper_functions.fetch_userdetails import fetch_user_details_from_api
@@ -15,17 +16,6 @@ from helper_functions.add_patient_api import add_patient_to_api
 from state.state_manager import user_registration_state, self_state
 config = load_config()
 
-# Load Twilio configuration
-
-account_sid = config['account_sid']
-auth_token = config['auth_token']
-twilio_whatsapp_number = config['phone_number']
-
-# External api configs
-add_patient_api = config['add_patient']
-get_user_address_api = config['get_user_address_api']
-
-
 # Twilio SID
 relationship_sid = config['relationship_sid']
 nationality_sid = config['nationality_sid']
@@ -33,14 +23,7 @@ someone_else_relationship = config['someone_else_relationship']
 patient_nationality_someone = config['patient_nationality_someone']
 someone_else_gender = config['someone_else_gender']
 
-# Initiate Twilio Client
-client = Client(account_sid, auth_token)
 
-# Db apis
-check_nationality_api = config['check_nationality_api']
-save_user_details_api = config['save_user_details_api']
-update_nationality_api = config['update_nationality_api']
-check_surname_api = config['check_surname_api']
 
 
 
@@ -61,7 +44,7 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
 
     # Get current state for the user
     state = user_registration_state.get(mobile_api, {"step": "ask_booking_person"})
-    logger.debug(f"Current state for {mobile_api}: {state}")
+    logger.debug("Current state for %s: %s", mobile_api, state)
 
     # Step 2: Handle Booking Person Selection Flow
     if state["step"] == "ask_booking_person":
@@ -71,13 +54,9 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
             # Send Twilio template asking if booking for Self or Someone else
             try:
                 to = format_mobile_for_twilio(mobile_twilio)
-                message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=to,
-                    content_sid=relationship_sid
-                )
-                logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-                return {"status": "success", "message_sid": message.sid}
+                send_whatsapp_message(to, content_sid=relationship_sid)
+                logger.info(f"Quick reply template sent to {to}")
+                return {"status": "success", "message": "Quick reply template sent."}
             except Exception as e:
                 logger.error(f"Failed to send quick reply template to {mobile_twilio}: {e}")
                 return {"status": "error", "error": str(e)}
@@ -92,7 +71,7 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
             user_registration_state[mobile_api]["action"] = "other_booking"  
             user_registration_state[mobile_api]["step"] = "show_patient_list"
 
-            logger.debug(f"Updated state for {mobile_api}: {user_registration_state[mobile_api]}")
+            logger.debug("Updated state for %s: %s", mobile_api, user_registration_state[mobile_api])
             
             return add_patient_flow_others(mobile_api, mobile_twilio, message)
 
@@ -102,7 +81,18 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
 
         elif booking_person.lower() == "self":  # Handle Self booking case
 
-            user_details = fetch_user_details_from_api(mobile_api)
+            # The profile and nationality lookups don't depend on each other, so they run concurrently.
+            # The surname check is only needed when the profile has no surname, so it waits for the profile.
+            lookups = fan_out({
+                "user_details": lambda: fetch_user_details_from_api(mobile_api),
+                "nationality": lambda: backend_client.post("check_nationality_api", json={"mobile_api": mobile_api}),
+            })
+
+            try:
+                user_details = lookups["user_details"].result()
+            except requests.RequestException as e:
+                logger.error(f"Error while fetching user details for {mobile_api}: {e}")
+                user_details = {}
 
             # 3.1: Validate fetched user details
             if not user_details:
@@ -122,15 +112,14 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
             # Step 4: Surname Validation Process
             # 4.1: Check if surname exists for registered user in API response
             if user_details.get("surname"):
-                logger.debug(f"Surname already found in API response: {user_details['surname']}")
+                logger.debug("Surname already found in API response: %s", user_details['surname'])
                 state.update(user_details)
             else:
                 # 4.2: If surname missing, check MongoDB
                 logger.warning(f"Surname missing in API response for {mobile_api}. Checking MongoDB...")
                 try:
-                    api_payload = {"mobile_api": mobile_api}
-                    response = requests.post(check_surname_api, json=api_payload)
-                    logger.debug(f"🔄 Sent request to check_surname_api for {mobile_api}. Response Status: {response.status_code}")
+                    response = backend_client.post("check_surname_api", json={"mobile_api": mobile_api})
+                    logger.debug("🔄 Sent request to check_surname_api for %s. Response Status: %s", mobile_api, response.status_code)
 
                     # 4.3: If Surname found in MongoDB, update state
                     if response.status_code == 200:
@@ -139,18 +128,18 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
 
                         if saved_surname:
                             user_details["surname"] = saved_surname
-                            logger.debug(f"Surname found in MongoDB for {mobile_api}: {saved_surname}")
+                            logger.debug("Surname found in MongoDB for %s: %s", mobile_api, saved_surname)
                             state.update(user_details)
                         else:
                             # 4.4: Ask user for surname if not found anywhere both in Mongo db and API response
                             state.update(user_details)
                             state["step"] = "ask_surname_self" # Update state to ask for surname
                             send_whatsapp_message(mobile_twilio, body="Please provide your surname:")
-                            logger.debug(f"Surname missing for {mobile_api}. Asking user...")
+                            logger.debug("Surname missing for %s. Asking user...", mobile_api)
                             return {"status": "success", "message": "Requesting surname"}
 
                     else:
-                        logger.error(f"Failed to check surname in MongoDB. Status Code: {response.status_code}, Response: {response.text}")
+                        logger.error("Failed to check surname in MongoDB. Status Code: %s, Response: %s", response.status_code, response.text)
                         send_whatsapp_message(mobile_twilio, body="An error occurred while processing your request. Please try again later.")
                         return {"status": "error", "message": "Failed to check surname via API"}
 
@@ -162,15 +151,14 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
 
             # Step 5: Update state with complete user details
             state.update(user_details)
-            logger.debug(f"Final state updated for {mobile_api}: {state}")
+            logger.debug("Final state updated for %s: %s", mobile_api, state)
 
             # Step 6: Nationality Check Process
             # 6.1: Query MongoDB for existing nationality
             try:
-                api_payload = {"mobile_api": mobile_api}
-                logger.info(f"Checking nationality via API: {api_payload}")
-                
-                response = requests.post(check_nationality_api, json=api_payload)
+                logger.info(f"Checking nationality via API for {mobile_api}")
+
+                response = lookups["nationality"].result()
 
                 # 6.2: Process nationality check response
                 if response.status_code == 200:
@@ -183,7 +171,7 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
                     else:
                         logger.info(f"No nationality found for {mobile_api}. Proceeding to ask.")
                 else:
-                    logger.error(f"Failed to check nationality via API. Status Code: {response.status_code}, Response: {response.text}")
+                    logger.error("Failed to check nationality via API. Status Code: %s, Response: %s", response.status_code, response.text)
                     send_whatsapp_message(mobile_twilio, body="An error occurred while processing your request. Please try again later.")
                     return {"status": "error", "message": "Failed to check nationality via API"}
 
@@ -206,7 +194,7 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
 
                 logger.info(f"Sending user details to save API: {api_payload}")
                     
-                response = requests.post(save_user_details_api, json=api_payload)
+                response = backend_client.post("save_user_details_api", json=api_payload)
 
                 # 7.1: Process save response
                 if response.status_code == 200:
@@ -216,9 +204,9 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
                     elif api_response.get("message") == "User already exists":
                         logger.info(f"User already exists in MongoDB for {mobile_api}")
                     else:
-                        logger.warning(f"Unexpected response from save API: {api_response}")
+                        logger.warning("Unexpected response from save API: %s", api_response)
                 else:
-                    logger.error(f"Failed to save user details via API. Status Code: {response.status_code}, Response: {response.text}")
+                    logger.error("Failed to save user details via API. Status Code: %s, Response: %s", response.status_code, response.text)
                     send_whatsapp_message(mobile_twilio, body="An error occurred while saving your details. Please try again later.")
                     return {"status": "error", "message": "Failed to save details via API"}
 
@@ -229,17 +217,13 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
 
             # Step 8: Proceed to nationality collection
             state["step"] = "ask_nationality"
-            logger.debug(f"State updated to: {state}")
+            logger.debug("State updated to: %s", state)
 
             # 8.1: Send nationality question template
             try:
-                message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=mobile_twilio,
-                    content_sid=nationality_sid
-                )
-                logger.info(f"Quick reply template sent to {mobile_twilio} with SID: {message.sid}")
-                return {"status": "success", "message_sid": message.sid}
+                send_whatsapp_message(mobile_twilio, content_sid=nationality_sid)
+                logger.info(f"Quick reply template sent to {mobile_twilio}")
+                return {"status": "success", "message": "Quick reply template sent."}
             except Exception as e:
                 logger.error(f"Failed to send quick reply template to {mobile_twilio}: {e}")
                 return {"status": "error", "error": str(e)}
@@ -257,7 +241,7 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
         state["surname"] = surname
         state["step"] = "ask_nationality"
         user_registration_state[mobile_api] = state  #  Persist updated state
-        logger.debug(f" Surname saved for {mobile_api}. Moving to ask_nationality. Updated state: {state}")
+        logger.debug(" Surname saved for %s. Moving to ask_nationality. Updated state: %s", mobile_api, state)
 
         #  Call MongoDB Save API
         try:
@@ -272,7 +256,7 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
             }
 
             logger.info(f" Sending user details to MongoDB save API: {api_payload}")
-            response = requests.post(save_user_details_api, json=api_payload)
+            response = backend_client.post("save_user_details_api", json=api_payload)
 
             if response.status_code == 200:
                 api_response = response.json()
@@ -281,9 +265,9 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
                 elif api_response.get("message") == "User already exists":
                     logger.info(f" User already exists in MongoDB for {mobile_api}")
                 else:
-                    logger.warning(f" Unexpected response from save API: {api_response}")
+                    logger.warning(" Unexpected response from save API: %s", api_response)
             else:
-                logger.error(f" Failed to save user details in MongoDB. Status Code: {response.status_code}, Response: {response.text}")
+                logger.error(" Failed to save user details in MongoDB. Status Code: %s, Response: %s", response.status_code, response.text)
                 send_whatsapp_message(mobile_twilio, body="An error occurred while saving your details. Please try again later.")
                 return {"status": "error", "message": "Failed to save details via API"}
 
@@ -294,13 +278,9 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
 
         #  Now ask for nationality only once
         try:
-            message = client.messages.create(
-                from_=twilio_whatsapp_number,
-                to=mobile_twilio,
-                content_sid=nationality_sid
-            )
-            logger.info(f" Quick reply template sent to {mobile_twilio} for nationality. SID: {message.sid}")
-            return {"status": "success", "message_sid": message.sid}
+            send_whatsapp_message(mobile_twilio, content_sid=nationality_sid)
+            logger.info(f" Quick reply template sent to {mobile_twilio} for nationality.")
+            return {"status": "success", "message": "Quick reply template sent."}
         except Exception as e:
             logger.error(f" Failed to send quick reply template to {mobile_twilio}: {e}")
             return {"status": "error", "error": str(e)}
@@ -328,12 +308,12 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
                     "mobile": state.get("mobile"),
                     "nationality": state["nationality"],  # Ensure nationality is included
                 }
-                response = requests.post(save_user_details_api, json=api_payload)
+                response = backend_client.post("save_user_details_api", json=api_payload)
 
                 if response.status_code == 200:
                     logger.info(f"Nationality successfully saved for {mobile_api}")
                 else:
-                    logger.error(f"Failed to save nationality for {mobile_api}. API response: {response.text}")
+                    logger.error("Failed to save nationality for %s. API response: %s", mobile_api, response.text)
 
             except requests.RequestException as e:
                 logger.error(f"Error saving nationality to database: {e}")
@@ -350,14 +330,9 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
         else:
             # If the user types something other than Yes or No, send the quick reply template again
             try:
-                message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=mobile_twilio,
-                    content_sid=nationality_sid,
-                    
-                )
-                logger.info(f"Quick reply template sent to {mobile_twilio} with SID: {message.sid}")
-                return {"status": "success", "message_sid": message.sid}
+                send_whatsapp_message(mobile_twilio, content_sid=nationality_sid)
+                logger.info(f"Quick reply template sent to {mobile_twilio}")
+                return {"status": "success", "message": "Quick reply template sent."}
             except Exception as e:
                 logger.error(f"Failed to send quick reply template to {mobile_twilio}: {e}")
                 return {"status": "error", "error": str(e)}
@@ -386,12 +361,12 @@ def add_patient_flow_self(mobile_api: str, mobile_twilio: str, message: str = No
                 "mobile": state.get("mobile"),
                 "nationality": state["nationality"],  # Ensure nationality is included
             }
-            response = requests.post(save_user_details_api, json=api_payload)
+            response = backend_client.post("save_user_details_api", json=api_payload)
 
             if response.status_code == 200:
                 logger.info(f"Custom nationality successfully saved for {mobile_api}")
             else:
-                logger.error(f"Failed to save custom nationality for {mobile_api}. API response: {response.text}")
+                logger.error("Failed to save custom nationality for %s. API response: %s", mobile_api, response.text)
 
         except requests.RequestException as e:
             logger.error(f"Error saving custom nationality to database: {e}")
@@ -3,14 +3,36 @@
 from utils.logger import app_logger as logger
 import configparser
 import os
+import time
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping
 
+# POST endpoints that only look data up, so a failed call can safely be sent again
+DEFAULT_RETRY_ENDPOINTS = (
+    "user_view, fetch_pt_list, show_address_api, get_user_address_api, booking_list, booking_details, "
+    "branch_details, get_booking_api, check_nationality_api, check_surname_api"
+)
+
+
+def _parse_timeout(value: str) -> tuple:
+    """
+    Parses a "connect, read" timeout pair in seconds. A single number is used for both.
+    """
+    parts = [float(part) for part in value.split(',')]
+    return (parts[0], parts[-1])
+
+
+@lru_cache(maxsize=None)
 def load_config():
     """
-    Loads configuration from the config.ini file.
+    Loads configuration from the config.ini file, or from the file named by the CHATBOT_CONFIG environment variable.
+    The file is parsed on first use only; every later call returns the same read-only mapping.
     """
-    
-    config = configparser.ConfigParser()
-    config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
+    started = time.perf_counter()
+    config = configparser.ConfigParser(inline_comment_prefixes=("#",))
+    config_path = os.environ.get('CHATBOT_CONFIG') or os.path.join(os.path.dirname(__file__), 'config.ini')
     
     if os.path.exists(config_path):
         config.read(config_path)
@@ -99,6 +121,136 @@ def load_config():
             'add_family_patient': config['content_sid']['add_family_patient']
         }
         
+        # HTTP client tuning (optional sections, defaults apply when missing)
+        default_timeout = _parse_timeout(config.get('timeouts', 'default', fallback='3.05, 15'))
+        endpoint_timeouts = {'default': default_timeout, 'booking_presc_api': (default_timeout[0], 60.0)}
+        if config.has_section('timeouts'):
+            for key, value in config.items('timeouts'):
+                endpoint_timeouts[key] = _parse_timeout(value)
+
+        # Concurrent calls allowed per endpoint, with a default for every other endpoint
+        pool_maxsize = config.getint('http', 'pool_maxsize', fallback=50)
+        bulkhead_limits = {'default': pool_maxsize, 'booking_presc_api': 16}
+        if config.has_section('bulkheads'):
+            for key in config.options('bulkheads'):
+                bulkhead_limits[key] = config.getint('bulkheads', key)
+
+        # Retries, circuit breakers and bulkheads around backend calls (optional sections, defaults apply when missing)
+        resilience_config = {
+            'retry_attempts': config.getint('resilience', 'retry_attempts', fallback=2),
+            'retry_backoff': config.getfloat('resilience', 'retry_backoff', fallback=0.1),
+            'retry_budget_ratio': config.getfloat('resilience', 'retry_budget_ratio', fallback=0.2),
+            'retry_budget_min': config.getfloat('resilience', 'retry_budget_min', fallback=1.0),
+            'retry_endpoints': frozenset(
+                name.strip() for name in config.get('resilience', 'retry_endpoints', fallback=DEFAULT_RETRY_ENDPOINTS).split(',') if name.strip()
+            ),
+            'breaker_failures': config.getint('resilience', 'breaker_failures', fallback=5),
+            'breaker_reset': config.getfloat('resilience', 'breaker_reset', fallback=30.0),
+            'bulkhead_limits': MappingProxyType(bulkhead_limits),
+            'bulkhead_wait': config.getfloat('resilience', 'bulkhead_wait', fallback=1.0),
+        }
+
+        http_config = {
+            'http_pool_maxsize': pool_maxsize,
+            'http_timeouts': MappingProxyType(endpoint_timeouts),
+        }
+
+        # Outbound messaging (optional section, defaults apply when missing)
+        messaging_config = {
+            'background_send': config.getboolean('messaging', 'background_send', fallback=True),
+            'send_workers': config.getint('messaging', 'send_workers', fallback=8),
+            'send_timeout': config.getfloat('messaging', 'send_timeout', fallback=10.0),
+            'reply_mode': config.get('messaging', 'reply_mode', fallback='rest'),
+            'send_rate': config.getfloat('messaging', 'send_rate', fallback=80.0),
+            'send_burst': config.getfloat('messaging', 'send_burst', fallback=80.0),
+            'send_retries': config.getint('messaging', 'send_retries', fallback=4),
+        }
+
+        # Prescription media handling (optional section, defaults apply when missing)
+        media_config = {
+            'media_max_bytes': config.getint('media', 'max_bytes', fallback=10 * 1024 * 1024),
+            'media_spool_bytes': config.getint('media', 'spool_bytes', fallback=1024 * 1024),
+        }
+
+        # Read-through caches for backend lookups (optional section, defaults apply when missing)
+        cache_config = {
+            'profile_cache_ttl': config.getint('cache', 'profile_ttl', fallback=300),
+            'profile_cache_negative_ttl': config.getint('cache', 'profile_negative_ttl', fallback=60),
+            'profile_cache_size': config.getint('cache', 'profile_size', fallback=10000),
+            'booking_index_ttl': config.getint('cache', 'booking_ttl', fallback=300),
+            'booking_index_size': config.getint('cache', 'booking_size', fallback=10000),
+            'report_cache_ttl': config.getint('cache', 'report_ttl', fallback=60),
+            'report_cache_size': config.getint('cache', 'report_size', fallback=10000),
+            'report_prefetch_timeout': config.getfloat('cache', 'report_prefetch_timeout', fallback=2.0),
+            'address_cache_ttl': config.getint('cache', 'address_ttl', fallback=600),
+            'address_cache_size': config.getint('cache', 'address_size', fallback=10000),
+        }
+
+        # Concurrent backend lookups within one request (optional section, defaults apply when missing)
+        fanout_config = {
+            'fanout_workers': config.getint('fanout', 'workers', fallback=32),
+            'fanout_timeout': config.getfloat('fanout', 'timeout', fallback=12.0),
+        }
+
+        # Conversation state storage (optional section, defaults apply when missing)
+        state_config = {
+            'state_backend': config.get('state', 'backend', fallback='memory'),
+            'state_redis_url': config.get('state', 'redis_url', fallback='redis://localhost:6379/0'),
+            'state_redis_ttl': config.getint('state', 'redis_ttl', fallback=86400),
+            'state_max_entries': config.getint('state', 'max_entries', fallback=50000),
+            'state_max_bytes': config.getint('state', 'max_bytes', fallback=256 * 1024 * 1024),
+        }
+
+        # Idle TTL in seconds per conversation action, with a default for every other action
+        state_idle_ttls = {'default': 1800}
+        if config.has_section('state_ttl'):
+            for key in config.options('state_ttl'):
+                state_idle_ttls[key] = config.getint('state_ttl', key)
+        state_config['state_idle_ttls'] = MappingProxyType(state_idle_ttls)
+
+        # Webhook retry deduplication (optional section, defaults apply when missing)
+        idempotency_config = {
+            'idempotency_ttl': config.getint('idempotency', 'ttl', fallback=600),
+            'idempotency_size': config.getint('idempotency', 'size', fallback=10000),
+        }
+
+        # Durable background jobs, e.g. saving a new booking to the database (optional section, defaults apply when missing)
+        jobs_config = {
+            'jobs_path': config.get('jobs', 'path', fallback=os.path.join(os.path.dirname(__file__), 'jobs.sqlite3')),
+            'jobs_workers': config.getint('jobs', 'workers', fallback=2),
+            'jobs_max_attempts': config.getint('jobs', 'max_attempts', fallback=8),
+            'jobs_backoff': config.getfloat('jobs', 'backoff', fallback=2.0),
+            'jobs_backoff_max': config.getfloat('jobs', 'backoff_max', fallback=600.0),
+        }
+
+        # Per-sender inbound limit on the webhook (optional section, defaults apply when missing)
+        throttle_config = {
+            'throttle_limit': config.getint('throttle', 'limit', fallback=20),
+            'throttle_window': config.getfloat('throttle', 'window', fallback=60.0),
+            'throttle_action': config.get('throttle', 'action', fallback='reply'),
+            'throttle_delay_max': config.getfloat('throttle', 'delay_max', fallback=5.0),
+            'throttle_max_senders': config.getint('throttle', 'max_senders', fallback=100000),
+        }
+
+        # Logging (optional sections, defaults apply when missing)
+        logging_config = {
+            'log_level': config.get('logging', 'level', fallback='DEBUG'),
+            'log_format': config.get('logging', 'format', fallback='json'),
+            'log_max_field_chars': config.getint('logging', 'max_field_chars', fallback=2000),
+        }
+
+        # Fraction of DEBUG lines kept, per module or logger name, with a default for the rest
+        log_sample_rates = {}
+        if config.has_section('log_sampling'):
+            for key in config.options('log_sampling'):
+                log_sample_rates[key] = config.getfloat('log_sampling', key)
+        logging_config['log_sample_rates'] = MappingProxyType(log_sample_rates)
+
+        # Server tuning (optional section, defaults apply when missing)
+        server_config = {
+            'worker_threads': config.getint('server', 'worker_threads', fallback=200),
+        }
+
         # Combine all configurations
         loaded_config = {}
         
@@ -107,9 +259,101 @@ def load_config():
         loaded_config.update(patient_app_api_config)
         loaded_config.update(db_api_config)
         loaded_config.update(content_sid_config)
-        
-        return loaded_config
+        loaded_config.update(http_config)
+        loaded_config.update(resilience_config)
+        loaded_config.update(messaging_config)
+        loaded_config.update(media_config)
+        loaded_config.update(cache_config)
+        loaded_config.update(fanout_config)
+        loaded_config.update(state_config)
+        loaded_config.update(idempotency_config)
+        loaded_config.update(jobs_config)
+        loaded_config.update(throttle_config)
+        loaded_config.update(logging_config)
+        loaded_config.update(server_config)
+
+        # Named backend endpoints used by the shared API client
+        loaded_config['endpoints'] = MappingProxyType({**patient_app_api_config, **db_api_config})
+
+        logger.info(f"Configuration loaded from {config_path} in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return MappingProxyType(loaded_config)
         
     except KeyError as e:
         logger.error(f"Missing required configuration key: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Typed, read-only view of the credentials, endpoints and tuning options in config.ini.
+    Content SIDs stay in load_config(); flows look those up by name.
+    """
+    account_sid: str
+    auth_token: str
+    phone_number: str
+    endpoints: Mapping[str, str]
+    http_timeouts: Mapping[str, tuple]
+    http_pool_maxsize: int
+    retry_attempts: int
+    retry_backoff: float
+    retry_budget_ratio: float
+    retry_budget_min: float
+    retry_endpoints: frozenset
+    breaker_failures: int
+    breaker_reset: float
+    bulkhead_limits: Mapping[str, int]
+    bulkhead_wait: float
+    worker_threads: int
+    background_send: bool
+    send_workers: int
+    send_timeout: float
+    reply_mode: str
+    send_rate: float
+    send_burst: float
+    send_retries: int
+    media_max_bytes: int
+    media_spool_bytes: int
+    profile_cache_ttl: int
+    profile_cache_negative_ttl: int
+    profile_cache_size: int
+    booking_index_ttl: int
+    booking_index_size: int
+    report_cache_ttl: int
+    report_cache_size: int
+    report_prefetch_timeout: float
+    address_cache_ttl: int
+    address_cache_size: int
+    fanout_workers: int
+    fanout_timeout: float
+    state_backend: str
+    state_redis_url: str
+    state_redis_ttl: int
+    state_max_entries: int
+    state_max_bytes: int
+    state_idle_ttls: Mapping[str, int]
+    idempotency_ttl: int
+    idempotency_size: int
+    jobs_path: str
+    jobs_workers: int
+    jobs_max_attempts: int
+    jobs_backoff: float
+    jobs_backoff_max: float
+    throttle_limit: int
+    throttle_window: float
+    throttle_action: str
+    throttle_delay_max: float
+    throttle_max_senders: int
+    log_level: str
+    log_format: str
+    log_max_field_chars: int
+    log_sample_rates: Mapping[str, float]
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Returns the process-wide Settings, built from load_config() on first use.
+    """
+    config = load_config()
+    return Settings(**{field.name: config[field.name] for field in fields(Settings)})
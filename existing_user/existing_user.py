@@ -1,28 +1,21 @@
 # existing/existing_user.py
 
-from twilio.rest import Client
 import requests
 from config import load_config
 from utils.logger import app_logger as logger
-from utils.messaging_utils import format_mobile_for_twilio
+from helper_functions.user_profile import get_user_profile
+from utils.messaging_utils import send_whatsapp_message, format_mobile_for_twilio, PRIORITY_LOW
 from existing_user.download_reports import handle_download_report
 from existing_user.booking_details import booking_details
 from booking.self_booking import add_patient_flow_self
 from state.state_manager import user_registration_state
-import json
 
 # Load configuration
 config = load_config()
-user_view = config['user_view']
-account_sid = config['account_sid']
-auth_token = config['auth_token']
 
-twilio_whatsapp_number = config['phone_number']
 existing_user_options_sid = config['existing_user_options_sid']
 
 
-# Initialize Twilio Client
-client = Client(account_sid, auth_token)
 
 
 def handle_user_interaction(mobile_api: str, mobile_twilio: str, option: str = None) -> dict:
@@ -34,15 +27,8 @@ def handle_user_interaction(mobile_api: str, mobile_twilio: str, option: str = N
     if not option:
         # Initial greeting and option presentation
         try:
-            payload = {"UserName": mobile_api}
-            response = requests.post(user_view, json=payload)
-            response.raise_for_status()
-
-            user_data = response.json()
-            if user_data.get("SuccessFlag") == "true" and user_data.get("Code") == 200:
-                user_name = user_data["Message"][0].get("Name", "User")
-            else:
-                user_name = "User"
+            profile = get_user_profile(mobile_api)
+            user_name = profile.get("Name", "User") if profile else "User"
         except requests.RequestException as e:
             logger.error(f"Error fetching user name from API for {mobile_api}: {e}")
             user_name = "User"
@@ -56,17 +42,12 @@ def handle_user_interaction(mobile_api: str, mobile_twilio: str, option: str = N
             # Format the mobile number for Twilio
             to = format_mobile_for_twilio(mobile_twilio)
             content_variables = {"1": user_name}
-            logger.debug(f"Content Variables: {content_variables}")
+            logger.debug("Content Variables: %s", content_variables)
 
             # Send the quick reply template using content SID
-            message = client.messages.create(
-                from_=twilio_whatsapp_number,
-                to=to,
-                content_sid=existing_user_options_sid,
-                content_variables=json.dumps(content_variables)
-            )
-            logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-            return {"status": "success", "message_sid": message.sid}
+            send_whatsapp_message(to, content_sid=existing_user_options_sid, content_variables=content_variables)
+            logger.info(f"Quick reply template sent to {to}")
+            return {"status": "success", "message": "Quick reply template sent."}
         except ValueError as ve:
             logger.error(f"Invalid mobile number provided: {ve}")
             return {"status": "error", "error": str(ve)}
@@ -96,13 +77,9 @@ def handle_user_interaction(mobile_api: str, mobile_twilio: str, option: str = N
             to = format_mobile_for_twilio(mobile_twilio)
 
             # Resend the quick reply template using content SID
-            message = client.messages.create(
-                from_=twilio_whatsapp_number,
-                to=to,
-                content_sid=existing_user_options_sid
-            )
-            logger.info(f"Quick reply template re-sent to {to} with SID: {message.sid}")
-            return {"status": "success", "message_sid": message.sid}
+            send_whatsapp_message(to, content_sid=existing_user_options_sid, priority=PRIORITY_LOW)
+            logger.info(f"Quick reply template re-sent to {to}")
+            return {"status": "success", "message": "Quick reply template sent."}
         except ValueError as ve:
             logger.error(f"Invalid mobile number provided: {ve}")
             return {"status": "error", "error": str(ve)}
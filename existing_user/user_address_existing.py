@@ -1,25 +1,18 @@
 # existing/user_address_existing.py
 
-from twilio.rest import Client
 import requests
 from config import load_config
 from state.state_manager import user_registration_state
 from utils.logger import app_logger as logger
-from utils.messaging_utils import send_whatsapp_message, format_mobile_for_twilio
+from utils.api_client import backend_client
+from utils.messaging_utils import send_whatsapp_message, format_mobile_for_twilio, PRIORITY_LOW
+from helper_functions.user_addresses import get_user_addresses, invalidate_user_addresses
 from new_user.book_presc import booking_with_prescription
-import json
 
 # Load configuration
 config = load_config()
-get_user_address_api = config['get_user_address_api']
-edit_user_address_api = config['edit_user_address_api']
-account_sid = config['account_sid']
-auth_token = config['auth_token']
-twilio_whatsapp_number = config['phone_number']
 existing_address = config['existing_address']  # Add your Twilio content SID for this template
 
-# Initialize Twilio Client
-client = Client(account_sid, auth_token)
 
 # Twilio content sid
 province_sid = config['province_sid']
@@ -35,12 +28,10 @@ def existing_user_address(mobile_api: str, mobile_twilio: str, message: str = No
     # Step 1: Fetch and display existing address
     if state.get("step") is None:
         try:
-            response = requests.post(get_user_address_api, json={"Username": mobile_api})
-            response.raise_for_status()
-            api_response = response.json()
+            addresses = get_user_addresses(mobile_api)
 
-            if api_response.get("SuccessFlag") == "True" and api_response.get("Code") == 200:
-                user_address = api_response["Message"][0]["User_Address"][0]
+            if addresses:
+                user_address = dict(addresses[0])
                 state.update({"action": "existing_address", "step": "confirm_or_edit", "address": user_address})
                 user_registration_state[mobile_api] = state
 
@@ -49,24 +40,19 @@ def existing_user_address(mobile_api: str, mobile_twilio: str, message: str = No
                     full_address = user_address.get("Full_Address", "No address available.")
                     content_variables = {"1": full_address}
 
-                    logger.debug(f"Content Variables: {content_variables}")
+                    logger.debug("Content Variables: %s", content_variables)
 
                     to = format_mobile_for_twilio(mobile_twilio)
-                    message = client.messages.create(
-                        from_=twilio_whatsapp_number,
-                        to=to,
-                        content_sid=existing_address,
-                        content_variables=json.dumps(content_variables)
-                    )
-                    logger.info(f"Address confirmation template sent successfully. Message SID: {message.sid}")
-                    return {"status": "success", "message_sid": message.sid}
+                    send_whatsapp_message(to, content_sid=existing_address, content_variables=content_variables)
+                    logger.info(f"Address confirmation template sent successfully to {to}.")
+                    return {"status": "success", "message": "Quick reply template sent."}
 
                 except Exception as e:
                     logger.error(f"Error sending address confirmation template: {e}")
                     return {"status": "error", "message": str(e)}
 
             else:
-                logger.error(f"Failed to fetch address: {api_response.get('Message', 'Unknown error')}")
+                logger.error(f"No saved address found for {mobile_api}.")
                 response_message = "Unable to fetch your address. Please try again later."
                 send_whatsapp_message(mobile_twilio, body=response_message)
                 return {"status": "error", "message": response_message}
@@ -97,19 +83,13 @@ def existing_user_address(mobile_api: str, mobile_twilio: str, message: str = No
                 full_address = state.get("address", {}).get("Full_Address", "No address available.")
                 content_variables = {"1": full_address}
 
-                logger.debug(f"Re-prompt Content Variables: {content_variables}")
+                logger.debug("Re-prompt Content Variables: %s", content_variables)
 
                 to = format_mobile_for_twilio(mobile_twilio)
-                message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=to,
-                    content_sid=existing_address,
-                    content_variables=json.dumps(content_variables)
-                )
-                logger.info(f"Re-prompt template sent successfully. Message SID: {message.sid}")
+                send_whatsapp_message(to, content_sid=existing_address, content_variables=content_variables, priority=PRIORITY_LOW)
+                logger.info(f"Re-prompt template sent successfully to {to}.")
                 return {
                     "status": "success",
-                    "message_sid": message.sid,
                     "message": "Invalid response. Please reply 'Yes' to confirm the address or 'No' to edit it."
                 }
             except Exception as e:
@@ -152,13 +132,9 @@ def existing_user_address(mobile_api: str, mobile_twilio: str, message: str = No
             to = format_mobile_for_twilio(mobile_twilio)
 
             # Resend the quick reply template using content SID
-            message = client.messages.create(
-                from_=twilio_whatsapp_number,
-                to=to,
-                content_sid=province_sid
-            )
-            logger.info(f"Quick reply template re-sent to {to} with SID: {message.sid}")
-            return {"status": "success", "message_sid": message.sid}
+            send_whatsapp_message(to, content_sid=province_sid)
+            logger.info(f"Quick reply template re-sent to {to}")
+            return {"status": "success", "message": "Quick reply template sent."}
         except ValueError as ve:
             logger.error(f"Invalid mobile number provided: {ve}")
             return {"status": "error", "error": str(ve)}
@@ -200,12 +176,8 @@ def existing_user_address(mobile_api: str, mobile_twilio: str, message: str = No
             to = format_mobile_for_twilio(mobile_twilio)
 
             # Resend the quick reply template using Content SID
-            message = client.messages.create(
-                from_=twilio_whatsapp_number,
-                to=to,
-                content_sid=user_address_confirmation
-            )
-            logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
+            send_whatsapp_message(to, content_sid=user_address_confirmation)
+            logger.info(f"Quick reply template sent to {to}")
         except ValueError as ve:
             logger.error(f"Invalid mobile number provided: {ve}")
             return {"status": "error", "error": str(ve)}
@@ -249,7 +221,9 @@ def existing_user_address(mobile_api: str, mobile_twilio: str, message: str = No
             }
 
             try:
-                response = requests.post(edit_user_address_api, json=payload)
+                response = backend_client.post("edit_user_address_api", json=payload)
+                # Whatever the outcome, the cached addresses may no longer match the backend
+                invalidate_user_addresses(mobile_api)
                 response.raise_for_status()
                 api_response = response.json()
 
@@ -287,12 +261,8 @@ def existing_user_address(mobile_api: str, mobile_twilio: str, message: str = No
                 to = format_mobile_for_twilio(mobile_twilio)
 
                 # Resend the quick reply template using Content SID
-                message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=to,
-                    content_sid=user_address_confirmation
-                )
-                logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
+                send_whatsapp_message(to, content_sid=user_address_confirmation, priority=PRIORITY_LOW)
+                logger.info(f"Quick reply template sent to {to}")
             except ValueError as ve:
                 logger.error(f"Invalid mobile number provided: {ve}")
                 return {"status": "error", "error": str(ve)}
@@ -2,41 +2,50 @@
 
 # existing/add_pt_existing.py
 
-import requests
-from config import load_config
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
-from twilio.rest import Client
+import requests
 
+from config import get_settings
 from existing_user.user_address_existing import existing_user_address
 from new_user.user_address import add_new_address
 from utils.logger import app_logger as logger
+from utils.api_client import backend_client
+from utils.fanout import submit
 from utils.messaging_utils import send_whatsapp_message
 from utils.messaging_utils import clean_mobile_number_for_api
 from state.state_manager import user_registration_state, self_state, relationship_state
+from helper_functions.service_booking import invalidate_patient_snapshot
+from helper_functions.user_addresses import get_user_addresses
 
-config = load_config()
-
-# Load Twilio configuration
+settings = get_settings()
 
-account_sid = config['account_sid']
-auth_token = config['auth_token']
-twilio_whatsapp_number = config['phone_number']
-
-# External api configs
-add_patient_api = config['add_patient']
-get_user_address_api = config['get_user_address_api']
 
+def saved_addresses(mobile_api: str, lookup: Future) -> tuple:
+    """
+    Waits for the address lookup started alongside add_patient. Empty when it failed or took too long,
+    which sends the user to adding a new address.
+    """
+    try:
+        return lookup.result(timeout=settings.fanout_timeout)
+    except (requests.RequestException, FutureTimeoutError) as e:
+        lookup.cancel()
+        logger.error(f"Error fetching addresses for {mobile_api}: {e}")
+        return ()
 
 
-# Initiate Twilio Client
-client = Client(account_sid, auth_token)
 
-# Db apis
-check_nationality_api = config['check_nationality_api']
-save_user_details_api = config['save_user_details_api']
-update_nationality_api = config['update_nationality_api']
-check_surname_api = config['check_surname_api']
+def continue_to_address(mobile_api: str, mobile_twilio: str, addresses) -> dict:
+    """
+    Moves to the existing address flow when the user has a saved address, otherwise to adding a new one.
+    """
+    if addresses:
+        logger.info(f"Address found for {mobile_api}, proceeding to existing address flow.")
+        return existing_user_address(mobile_api, mobile_twilio, message="")
 
+    # If no address exists, prompt the user to add a new address
+    logger.info(f"No address found for {mobile_api}, proceeding to add new address flow.")
+    return add_new_address(mobile_api, mobile_twilio)
 
 
 
@@ -48,7 +57,7 @@ def add_patient_to_api(mobile_api: str, mobile_twilio: str, state: dict) -> dict
     try:
         # Clean the mobile number for API use
         username = clean_mobile_number_for_api(mobile_api)
-        logger.debug(f"Cleaned mobile number: {username}")
+        logger.debug("Cleaned mobile number: %s", username)
     except ValueError as e:
         logger.error(f"Error validating Username: {e}")
         send_whatsapp_message(mobile_twilio, body="Invalid mobile number. Please provide a valid 10-digit mobile number.")
@@ -72,15 +81,26 @@ def add_patient_to_api(mobile_api: str, mobile_twilio: str, state: dict) -> dict
         "Nationality": state.get("nationality", "Saudi"),
     }
 
-    logger.debug(f"Payload sent to Add Patient API: {payload}")
+    logger.debug("Payload sent to Add Patient API: %s", payload)
 
-    # Make the request to Add Patient API
-    response = requests.post(add_patient_api, json=payload)
-    api_response = response.json()
+    # Look up the user's addresses while the patient is added; the lookup doesn't depend on the new patient.
+    # add_patient itself runs here under its own read timeout: it is a write, so it must not be cut short by a fan-out deadline.
+    # The addresses are cached, so the existing address step that follows doesn't fetch them again
+    address_lookup = submit(lambda: get_user_addresses(mobile_api))
+    try:
+        response = backend_client.post("add_patient", json=payload)
+        api_response = response.json()
+    except requests.RequestException as e:
+        logger.error(f"Error calling Add Patient API for {mobile_api}: {e}")
+        send_whatsapp_message(mobile_twilio, body="An error occurred. Try again later.")
+        return {"status": "error", "message": str(e)}
+
+    # The patient list shown earlier in this conversation is stale once a patient is added
+    invalidate_patient_snapshot(mobile_api)
 
     # Log the API response status and content
-    logger.debug(f"API Response Status Code: {response.status_code}")
-    logger.debug(f"API Response Content: {api_response}")   
+    logger.debug("API Response Status Code: %s", response.status_code)
+    logger.debug("API Response Content: %s", api_response)
 
 
 
@@ -96,7 +116,7 @@ def add_patient_to_api(mobile_api: str, mobile_twilio: str, state: dict) -> dict
             self_state[mobile_api] = {}       
             # Save the patient code to the state only when self is present
             self_state[mobile_api]["patient_code"] = patient_code
-            logger.debug(f"Patient code saved to self_state for {mobile_api}: {self_state[mobile_api]}")
+            logger.debug("Patient code saved to self_state for %s: %s", mobile_api, self_state[mobile_api])
             logger.info(f"Patient added successfully with Patient Code: {patient_code}")
 
 
@@ -104,23 +124,7 @@ def add_patient_to_api(mobile_api: str, mobile_twilio: str, state: dict) -> dict
         del user_registration_state[mobile_api]
 
         # Check if the patient has an address
-        address_payload = {"Username": mobile_api}
-        address_response = requests.post(get_user_address_api, json=address_payload)  # Use POST as per request format
-
-        if address_response.status_code == 200:
-            address_data = address_response.json()
-            user_message_data = address_data.get("Message", [{}])
-
-            if isinstance(user_message_data, list) and len(user_message_data) > 0:
-                user_address_list = user_message_data[0].get("User_Address", [])
-
-                if isinstance(user_address_list, list) and len(user_address_list) > 0:
-                    logger.info(f"Address found for {mobile_api}, proceeding to existing address flow.")
-                    return existing_user_address(mobile_api, mobile_twilio, message="")
-
-        # If no address exists, prompt the user to add a new address
-        logger.info(f"No address found for {mobile_api}, proceeding to add new address flow.")
-        return add_new_address(mobile_api, mobile_twilio)
+        return continue_to_address(mobile_api, mobile_twilio, saved_addresses(mobile_api, address_lookup))
 
 
 
@@ -140,7 +144,7 @@ def add_patient_to_api(mobile_api: str, mobile_twilio: str, state: dict) -> dict
 
             # Save the patient code to the state
             self_state[mobile_api]["patient_code"] = patient_code
-            logger.debug(f"Patient code saved to self_state: {self_state}")
+            logger.debug("Patient code saved to self_state: %s", self_state)
 
             # Update nationality for self-users
             if state.get("nationality"):
@@ -149,7 +153,7 @@ def add_patient_to_api(mobile_api: str, mobile_twilio: str, state: dict) -> dict
                         "mobile_api": mobile_api,
                         "nationality": state["nationality"].strip(),
                     }
-                    update_response = requests.put(update_nationality_api, json=update_payload)
+                    update_response = backend_client.put("update_nationality_api", json=update_payload)
                     if update_response.status_code == 200:
                         logger.info(f"Nationality updated successfully to {state['nationality']} for {mobile_api}")
                     else:
@@ -160,23 +164,7 @@ def add_patient_to_api(mobile_api: str, mobile_twilio: str, state: dict) -> dict
             del user_registration_state[mobile_api]
 
             # Check if the patient has an address
-            address_payload = {"Username": mobile_api}
-            address_response = requests.post(get_user_address_api, json=address_payload)  # Use POST as per request format
-
-            if address_response.status_code == 200:
-                address_data = address_response.json()
-                user_message_data = address_data.get("Message", [{}])
-
-                if isinstance(user_message_data, list) and len(user_message_data) > 0:
-                    user_address_list = user_message_data[0].get("User_Address", [])
-
-                    if isinstance(user_address_list, list) and len(user_address_list) > 0:
-                        logger.info(f"Address found for {mobile_api}, proceeding to existing address flow.")
-                        return existing_user_address(mobile_api, mobile_twilio, message="")
-
-            # If no address exists, prompt the user to add a new address
-            logger.info(f"No address found for {mobile_api}, proceeding to add new address flow.")
-            return add_new_address(mobile_api, mobile_twilio)
+            return continue_to_address(mobile_api, mobile_twilio, saved_addresses(mobile_api, address_lookup))
 
         else:
             logger.error("Patient Code not found in the response message.")
@@ -185,6 +173,6 @@ def add_patient_to_api(mobile_api: str, mobile_twilio: str, state: dict) -> dict
 
     # Handle any other unexpected API response or error
     else:
-        logger.error(f"Unexpected error or failure during patient registration: {api_response}")
+        logger.error("Unexpected error or failure during patient registration: %s", api_response)
         send_whatsapp_message(mobile_twilio, body="An error occurred. Try again later.")
         return {"status": "error", "message": "Unknown error occurred."}
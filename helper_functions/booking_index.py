@@ -0,0 +1,136 @@
+# helper_functions/booking_index.py
+
+from datetime import datetime
+
+from config import load_config, get_settings
+from utils.logger import app_logger as logger
+from utils.api_client import backend_client
+from utils.messaging_utils import send_whatsapp_message, format_mobile_for_twilio, PRIORITY_NORMAL
+from utils.ttl_cache import TTLCache
+
+config = load_config()
+settings = get_settings()
+
+booking_details_sid = config['booking_details_sid']
+
+# The booking quick-reply template has three buttons
+PAGE_SIZE = 3
+NEXT_LABEL = "More bookings ▶"
+EMPTY_LABEL = "No Booking Available"
+
+booking_cache = TTLCache(ttl=settings.booking_index_ttl, maxsize=settings.booking_index_size)
+
+
+def _booking_list(api_response: dict) -> list:
+    bookings = (api_response.get("Message") or [{}])[0].get("Booking_Detail") or []
+    # Most recent first; Booking_Date is YYYY/MM/DD so it sorts as text
+    return sorted(bookings, key=lambda booking: booking.get("Booking_Date") or "", reverse=True)
+
+
+def get_bookings(mobile_api: str) -> list:
+    """
+    Returns the user's bookings, most recent first, fetching booking_list only when the index has no entry.
+    Raises requests.RequestException when the API cannot be reached; failures are never cached.
+    """
+    bookings = booking_cache.get(mobile_api)
+    if bookings is not None:
+        return bookings
+
+    response = backend_client.post("booking_list", json={"Username": mobile_api})
+    response.raise_for_status()
+    bookings = _booking_list(response.json())
+    booking_cache.set(mobile_api, bookings)
+    return bookings
+
+
+def remember_bookings(mobile_api: str, api_response: dict):
+    """Stores a booking_list response fetched elsewhere (e.g. right after a booking) in the index."""
+    booking_cache.set(mobile_api, _booking_list(api_response))
+
+
+def invalidate_bookings(mobile_api: str):
+    """Drops the user's index, e.g. after a new booking is saved."""
+    booking_cache.invalidate(mobile_api)
+    logger.debug("Invalidated booking index for %s", mobile_api)
+
+
+def booking_page(bookings: list, offset: int = 0) -> tuple:
+    """
+    Returns ({"1": booking, ...}, next_offset) for the page starting at `offset`.
+    When more bookings follow, the page holds two bookings and the third button becomes "More bookings";
+    next_offset is None on the last page.
+    """
+    remaining = bookings[offset:]
+    if len(remaining) <= PAGE_SIZE:
+        return {str(idx): booking for idx, booking in enumerate(remaining, 1)}, None
+    shown = remaining[:PAGE_SIZE - 1]
+    return {str(idx): booking for idx, booking in enumerate(shown, 1)}, offset + len(shown)
+
+
+def _button_text(booking: dict, idx: str, used_texts: set, note: str = None) -> str:
+    booking_date = booking.get("Booking_Date", "")
+    pt_name = (booking.get("Pt_Name") or "").split()[:1]
+    pt_name = note or (pt_name[0] if pt_name else "")
+    try:
+        booking_date = datetime.strptime(booking_date, "%Y/%m/%d").strftime("%d/%m/%Y")
+    except ValueError:
+        pass
+    combined_text = f"{booking_date} {pt_name}"
+
+    # Truncate to fit within 24 characters
+    if len(combined_text) > 24:
+        pt_name = pt_name[:24 - len(booking_date) - 4].strip() + "..."
+        combined_text = f"{booking_date} {pt_name}"
+
+    # Ensure unique button text by appending the index if necessary
+    while combined_text in used_texts:
+        if len(combined_text) >= 24:
+            combined_text = combined_text[:23] + idx
+        else:
+            combined_text += f" ({idx})"
+    used_texts.add(combined_text)
+    return combined_text
+
+
+def page_content_variables(page: dict, next_offset, notes: dict = None) -> dict:
+    """
+    Builds the three booking_details_sid button texts (24-char limit) for a page.
+    `notes` maps a button to a short text shown instead of the patient name (e.g. "no report").
+    """
+    content_variables = {}
+    used_texts = set()
+    notes = notes or {}
+    for idx, booking in page.items():
+        content_variables[idx] = _button_text(booking, idx, used_texts, notes.get(idx))
+    if next_offset is not None:
+        content_variables[str(PAGE_SIZE)] = NEXT_LABEL
+
+    # Fill placeholders for any missing slots
+    for i in range(1, PAGE_SIZE + 1):
+        content_variables.setdefault(str(i), EMPTY_LABEL)
+    return content_variables
+
+
+def is_next_request(user_input: str, next_offset) -> bool:
+    """True when the reply asks for the next page: the "More bookings" button or a typed "next"."""
+    return next_offset is not None and user_input.strip().lower() in (str(PAGE_SIZE), "next", NEXT_LABEL.lower())
+
+
+def send_booking_page(mobile_twilio: str, state: dict, bookings: list, offset: int = 0, annotate=None):
+    """
+    Shows the page of bookings starting at `offset` on the booking quick-reply template and keeps it
+    in the conversation state: `booking_list` maps the buttons to bookings, `booking_next_offset` is the next page.
+    `annotate(page)` may return {button: note} to show instead of the patient names.
+    """
+    page, next_offset = booking_page(bookings, offset)
+    state["booking_list"] = page
+    state["booking_next_offset"] = next_offset
+    state["booking_notes"] = annotate(page) if annotate else {}
+    resend_booking_page(mobile_twilio, state)
+
+
+def resend_booking_page(mobile_twilio: str, state: dict, priority: int = PRIORITY_NORMAL):
+    """Sends the page held in the conversation state again, e.g. after an invalid choice (with PRIORITY_LOW)."""
+    content_variables = page_content_variables(state["booking_list"], state.get("booking_next_offset"), state.get("booking_notes"))
+    logger.debug("Final Content Variables (24-char limit): %s", content_variables)
+    send_whatsapp_message(format_mobile_for_twilio(mobile_twilio), content_sid=booking_details_sid, content_variables=content_variables, priority=priority)
@@ -0,0 +1,60 @@
+# helper_functions/booking_sync.py
+
+import sqlite3
+
+from config import get_settings
+from utils.logger import app_logger as logger
+from utils.api_client import backend_client
+from utils.job_queue import JobQueue
+from utils.metrics import registry
+from helper_functions.booking_index import remember_bookings
+from helper_functions.service_booking import save_booking_to_db
+
+settings = get_settings()
+
+# Follow-up work after a booking runs here, off the webhook request
+job_queue = JobQueue(
+    settings.jobs_path,
+    workers=settings.jobs_workers,
+    max_attempts=settings.jobs_max_attempts,
+    backoff=settings.jobs_backoff,
+    backoff_max=settings.jobs_backoff_max,
+)
+registry.gauge("chatbot_jobs", "Background jobs stored, by status (pending, running or dead).", ("status",), callback=job_queue.counts)
+registry.gauge("chatbot_job_oldest_due_seconds", "How long the oldest due background job has been waiting.", callback=job_queue.oldest_due_age)
+
+
+def sync_booking(payload: dict):
+    """
+    Fetches the user's booking_list (which now includes the new booking), refreshes the booking index
+    with it and saves it to the database. Raises on any failure so the job is retried.
+    A retry posts the same booking_list to save_booking again (also after a timeout on a save that went
+    through), so the save_booking endpoint must upsert by booking number rather than insert.
+    """
+    mobile_api = payload["mobile_api"]
+    fetch_response = backend_client.post("booking_list", json={"Username": mobile_api})
+    fetch_response.raise_for_status()
+
+    fetch_data = fetch_response.json()
+    if fetch_data.get("SuccessFlag") != "true" or fetch_data.get("Code") != 200:
+        raise RuntimeError(f"booking_list returned no bookings: {fetch_data}")
+
+    # Fresh list including the new booking: reuse it for Booking Details / Download Reports
+    remember_bookings(mobile_api, fetch_data)
+
+    # Save the booking_list response to MongoDB
+    save_fetched_result = save_booking_to_db(fetch_data)
+    if save_fetched_result["status"] != "success":
+        raise RuntimeError(save_fetched_result["message"])
+    logger.info(f"Fetched and saved booking details for {mobile_api}")
+
+
+job_queue.register("sync_booking", sync_booking)
+
+
+def queue_booking_sync(mobile_api: str):
+    """Records a sync_booking job for the user; it runs in the background and is retried until it succeeds."""
+    try:
+        job_queue.enqueue("sync_booking", {"mobile_api": mobile_api})
+    except sqlite3.Error as e:
+        logger.error(f"Could not queue booking sync for {mobile_api}: {e}")
@@ -0,0 +1,121 @@
+# helper_functions/media.py
+
+import io
+import os
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from requests.auth import HTTPBasicAuth
+
+from config import get_settings
+from utils.api_client import backend_client
+
+settings = get_settings()
+
+
+class MediaTooLargeError(ValueError):
+    """Raised when an uploaded media file is larger than [media] max_bytes."""
+
+
+def download_prescription_image(media_url: str) -> tuple:
+    """
+    Streams a Twilio media file into a spooled temporary file.
+    Small files stay in memory, larger ones roll over to disk, and nothing is kept in conversation state.
+    Returns (file, file_extension); the caller owns the file and must close it.
+    Raises requests.RequestException on download errors, MediaTooLargeError when the file exceeds
+    the configured cap and ValueError when it is not an image.
+    """
+    max_bytes = settings.media_max_bytes
+    response = backend_client.get(
+        "twilio_media",
+        url=media_url,
+        auth=HTTPBasicAuth(settings.account_sid, settings.auth_token),
+        stream=True
+    )
+    try:
+        response.raise_for_status()
+
+        # Validate content type to ensure it's an image before reading the body
+        content_type = response.headers.get("Content-Type", "")
+        if not content_type.startswith("image/"):
+            raise ValueError("Invalid file type uploaded. Expected an image.")
+
+        declared_length = int(response.headers.get("Content-Length") or 0)
+        if declared_length > max_bytes:
+            raise MediaTooLargeError(f"Media is {declared_length} bytes, the limit is {max_bytes}.")
+
+        spooled = SpooledTemporaryFile(max_size=settings.media_spool_bytes)
+        try:
+            received = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                received += len(chunk)
+                if received > max_bytes:
+                    raise MediaTooLargeError(f"Media exceeded the limit of {max_bytes} bytes.")
+                spooled.write(chunk)
+            spooled.seek(0)
+        except BaseException:
+            spooled.close()
+            raise
+
+        return spooled, content_type.split("/")[-1].lower()
+    finally:
+        response.close()
+
+
+class MultipartStream:
+    """
+    multipart/form-data body that reads the file part straight from a file object.
+    It has a known length, so requests sends it with a Content-Length header,
+    reading it in blocks instead of building the whole body in memory.
+    """
+
+    def __init__(self, fields: dict, file_field: str, filename: str, fileobj, content_type: str):
+        self.boundary = uuid.uuid4().hex
+        head = b"".join(
+            self._part_header(name, None, None) + str(value).encode() + b"\r\n"
+            for name, value in fields.items()
+        )
+        head += self._part_header(file_field, filename, content_type)
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+        fileobj.seek(0, os.SEEK_END)
+        file_size = fileobj.tell()
+        fileobj.seek(0)
+
+        self._parts = [io.BytesIO(head), fileobj, io.BytesIO(tail)]
+        self._length = len(head) + file_size + len(tail)
+
+    def _part_header(self, name: str, filename: str, content_type: str) -> bytes:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        header = f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n"
+        if content_type is not None:
+            header += f"Content-Type: {content_type}\r\n"
+        return (header + "\r\n").encode()
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            data = self._parts[0].read(size)
+            if not data:
+                self._parts.pop(0)
+                continue
+            chunks.append(data)
+            if size > 0:
+                size -= len(data)
+        return b"".join(chunks)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,59 @@
+# helper_functions/report_links.py
+
+import requests
+
+from config import get_settings
+from utils.logger import app_logger as logger
+from utils.api_client import backend_client
+from utils.fanout import fan_out
+from utils.ttl_cache import TTLCache
+
+settings = get_settings()
+
+# Marks a booking the Download Reports API has no report for (404)
+NO_REPORT = ""
+
+report_cache = TTLCache(ttl=settings.report_cache_ttl, maxsize=settings.report_cache_size)
+
+
+def get_report_url(booking_id: str):
+    """
+    Returns the report pdf_url for a booking, or None when the API has no report for it (404).
+    Both answers are cached for a short time. Raises requests.RequestException for other failures,
+    and ValueError when the response has no pdf_url; those are never cached.
+    """
+    cached = report_cache.get(booking_id)
+    if cached is not None:
+        return cached or None
+
+    response = backend_client.get("download_reports", booking_id)
+    if response.status_code == 404:
+        report_cache.set(booking_id, NO_REPORT)
+        return None
+    response.raise_for_status()
+
+    report_url = response.json().get("pdf_url")
+    if not report_url:
+        raise ValueError("PDF URL not found in API response.")
+    report_cache.set(booking_id, report_url)
+    return report_url
+
+
+def prefetch_report_urls(booking_ids: list) -> dict:
+    """
+    Resolves the reports of several bookings concurrently, blocking for at most settings.report_prefetch_timeout.
+    Returns {booking_id: True (report ready) / False (no report)}; bookings that failed or missed the deadline
+    are left out. A lookup already running at the deadline still fills the cache when it finishes;
+    one that had not started yet is cancelled and runs at the selection step instead.
+    """
+    lookups = fan_out(
+        {booking_id: (lambda booking_id=booking_id: get_report_url(booking_id)) for booking_id in booking_ids},
+        timeout=settings.report_prefetch_timeout,
+    )
+    available = {}
+    for booking_id, lookup in lookups.items():
+        try:
+            available[booking_id] = lookup.result() is not None
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Report prefetch for booking {booking_id} failed: {e}")
+    return available
@@ -1,14 +1,12 @@
 
 
 import requests
-from config import load_config
 from utils.logger import app_logger as logger
+from utils.api_client import backend_client
 from new_user.view_pt_det import fetch_patient_details
 from state.state_manager import user_registration_state
 from utils.messaging_utils import send_whatsapp_message
 
-config = load_config()
-save_booking_url = config['save_booking_url']
 
 
 def save_booking_to_db(api_response: dict):
@@ -20,8 +18,8 @@ def save_booking_to_db(api_response: dict):
         
 
         # POST the booking response to the save_booking API
-        response = requests.post(
-            save_booking_url,
+        response = backend_client.post(
+            "save_booking_url",
             json=api_response
         )
         response.raise_for_status()
@@ -31,7 +29,7 @@ def save_booking_to_db(api_response: dict):
             logger.info("Booking details successfully saved to the database.")
             return {"status": "success", "message": "Booking saved to database."}
         else:
-            logger.error(f"Failed to save booking to database. Response: {response.json()}")
+            logger.error("Failed to save booking to database. Response: %s", response.json())
             return {"status": "error", "message": "Failed to save booking to database."}
 
     except requests.RequestException as e:
@@ -50,7 +48,7 @@ def handle_patient_details(mobile_api: str, mobile_twilio: str) -> dict:
 
     # Fetch patient details
     patient_details = fetch_patient_details(mobile_api, mobile_twilio, user_state)
-    logger.debug(f"API Response: {patient_details}")
+    logger.debug("API Response: %s", patient_details)
 
     if patient_details.get("status") == "error":
         logger.warning(f"No patient details found for user: {mobile_api}")
@@ -72,6 +70,9 @@ def handle_patient_details(mobile_api: str, mobile_twilio: str) -> dict:
         response_message += "\n👉 *Reply with the serial number* (e.g., 1, 2, etc.) of the patient you want to proceed with."
         send_whatsapp_message(mobile_twilio, body=response_message)
 
+        # Keep the patient codes in the shown order so the serial-number reply needs no refetch
+        user_state["patient_snapshot"] = [patient.get("Pt_Code", "N/A") for patient in patient_list]
+
 
 
 
@@ -80,4 +81,30 @@ def handle_patient_details(mobile_api: str, mobile_twilio: str) -> dict:
 
     except KeyError as e:
         logger.error(f"KeyError while processing patient details: {e}")
-        return {"status": "error", "message": "An error occurred while fetching patient details."}
\ No newline at end of file
+        return {"status": "error", "message": "An error occurred while fetching patient details."}
+
+
+
+def get_patient_snapshot(mobile_api: str, mobile_twilio: str, user_state: dict) -> list:
+    """
+    Returns the patient codes in the order they were listed to the user.
+    Falls back to fetching the list when the conversation has no snapshot (e.g. it was invalidated).
+    """
+    snapshot = user_state.get("patient_snapshot")
+    if snapshot is not None:
+        return snapshot
+
+    logger.info(f"No patient snapshot for {mobile_api}, fetching the patient list.")
+    patient_list = fetch_patient_details(mobile_api, mobile_twilio, user_state).get("Message", [])[0].get("Patient_Detail", [])
+    snapshot = [patient.get("Pt_Code", "N/A") for patient in patient_list]
+    user_state["patient_snapshot"] = snapshot
+    return snapshot
+
+
+def invalidate_patient_snapshot(mobile_api: str):
+    """
+    Drops the snapshot after a patient is added, so the next selection sees the new list.
+    """
+    user_state = user_registration_state.get(mobile_api)
+    if user_state and user_state.pop("patient_snapshot", None) is not None:
+        logger.debug("Invalidated patient snapshot for %s", mobile_api)
@@ -0,0 +1,108 @@
+# helper_functions/slot_catalog.py
+
+import bisect
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from types import MappingProxyType
+from zoneinfo import ZoneInfo
+
+IST = ZoneInfo("Asia/Kolkata")
+
+# A visit is scheduled this long after the slot starts (or after now, inside a slot already running)
+VISIT_LEAD = timedelta(minutes=40)
+
+# Item IDs and labels of the morning/afternoon/evening slot templates (morning_slot_sid, ...)
+SLOT_DEFINITIONS = {
+    "morning": {
+        "1": "7 AM to 8 AM",
+        "2": "8 AM to 9 AM",
+        "3": "9 AM to 10 AM",
+        "4": "10 AM to 11 AM",
+        "5": "11 AM to 12 PM",
+    },
+    "afternoon": {
+        "1": "12 PM to 1 PM",
+        "2": "1 PM to 2 PM",
+        "3": "2 PM to 3 PM",
+        "4": "3 PM to 4 PM",
+        "5": "4 PM to 5 PM",
+        "6": "5 PM to 6 PM",
+    },
+    "evening": {
+        "1": "6 PM to 7 PM",
+        "2": "7 PM to 8 PM",
+        "3": "8 PM to 9 PM",
+        "4": "9 PM to 10 PM",
+        "5": "10 PM to 11 PM",
+    },
+}
+
+
+@dataclass(frozen=True)
+class Slot:
+    period: str
+    item_id: str
+    label: str
+    start: time
+    end: time
+
+    @property
+    def end_seconds(self) -> int:
+        return self.end.hour * 3600 + self.end.minute * 60
+
+
+def _parse_label(label: str) -> tuple:
+    """Parses "9 AM to 10 AM" into (time(9), time(10))."""
+    start, _, end = label.partition(" to ")
+    return (datetime.strptime(start, "%I %p").time(), datetime.strptime(end, "%I %p").time())
+
+
+class SlotCatalog:
+    """
+    Slot definitions parsed once: item ID lookup per period, and the slots of a period
+    that can still be booked on a date (today's slots whose end has passed drop out).
+    """
+
+    def __init__(self, definitions: dict):
+        self._by_period = {}
+        self._by_end = {}
+        for period, items in definitions.items():
+            slots = {item_id: Slot(period, item_id, label, *_parse_label(label)) for item_id, label in items.items()}
+            self._by_period[period] = MappingProxyType(slots)
+            ordered = sorted(slots.values(), key=lambda slot: slot.end_seconds)
+            self._by_end[period] = (tuple(slot.end_seconds for slot in ordered), tuple(ordered))
+
+    def get(self, period: str, item_id: str):
+        """Returns the Slot for a template item ID, or None when the period or ID is unknown."""
+        return self._by_period.get(period, {}).get(item_id)
+
+    def slots(self, period: str):
+        """Returns {item_id: Slot} for a period (empty for an unknown period)."""
+        return self._by_period.get(period, MappingProxyType({}))
+
+    def bookable(self, period: str, visit_date: date, now: datetime = None) -> tuple:
+        """Returns the period's slots, ordered by end time, that can still be booked for `visit_date`."""
+        now = now or datetime.now(IST)
+        ends, ordered = self._by_end.get(period, ((), ()))
+        today = now.date()
+        if visit_date != today:
+            return ordered if visit_date > today else ()
+        seconds = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+        return ordered[bisect.bisect_left(ends, seconds):]
+
+    @staticmethod
+    def visit_time(slot: Slot, visit_date: date, now: datetime = None):
+        """
+        Returns the visit time ("HH:MM", IST) for a slot on a date, or None when the slot has already passed today.
+        """
+        now = now or datetime.now(IST)
+        start = datetime.combine(visit_date, slot.start, IST)
+        if visit_date != now.date() or now < start:
+            return (start + VISIT_LEAD).strftime("%H:%M")
+        if now <= datetime.combine(visit_date, slot.end, IST):
+            return (now + VISIT_LEAD).strftime("%H:%M")
+        return None
+
+
+# Process-wide catalog shared by the booking flows
+slot_catalog = SlotCatalog(SLOT_DEFINITIONS)
@@ -0,0 +1,39 @@
+# helper_functions/user_addresses.py
+
+from config import get_settings
+from utils.logger import app_logger as logger
+from utils.api_client import backend_client
+from utils.ttl_cache import TTLCache
+
+settings = get_settings()
+
+address_cache = TTLCache(ttl=settings.address_cache_ttl, maxsize=settings.address_cache_size)
+
+
+def get_user_addresses(mobile_api: str) -> tuple:
+    """
+    Returns the user's saved addresses (User_Address records from get_user_address_api), empty when there are none.
+    Both answers are cached until the TTL runs out or the user adds or edits an address.
+    Raises requests.RequestException when the API cannot be reached or fails with a 5xx; failures are never cached.
+    """
+    cached = address_cache.get(mobile_api)
+    if cached is not None:
+        return cached
+
+    response = backend_client.post("get_user_address_api", json={"Username": mobile_api})
+    if response.status_code >= 500:
+        response.raise_for_status()
+
+    addresses = ()
+    if response.status_code == 200:
+        user_message_data = response.json().get("Message")
+        if isinstance(user_message_data, list) and user_message_data:
+            addresses = tuple(user_message_data[0].get("User_Address") or ())
+    address_cache.set(mobile_api, addresses)
+    return addresses
+
+
+def invalidate_user_addresses(mobile_api: str):
+    """Drops the cached addresses; call it after every add_user_address_api / edit_user_address_api write."""
+    address_cache.invalidate(mobile_api)
+    logger.debug("Invalidated address cache for %s", mobile_api)
@@ -0,0 +1,44 @@
+# helper_functions/user_profile.py
+
+from config import get_settings
+from utils.logger import app_logger as logger
+from utils.api_client import backend_client
+from utils.ttl_cache import TTLCache
+
+settings = get_settings()
+
+# Marks a number the User View API reported as not registered
+NOT_REGISTERED = {}
+
+profile_cache = TTLCache(ttl=settings.profile_cache_ttl, maxsize=settings.profile_cache_size)
+
+
+def get_user_profile(mobile_api: str):
+    """
+    Returns the User View record for a mobile number, or None when the number is not registered.
+    Registered and unregistered answers are both cached, so one conversation calls User View once.
+    Raises requests.RequestException when the API cannot be reached; failures are never cached.
+    """
+    cached = profile_cache.get(mobile_api)
+    if cached is not None:
+        return cached or None
+
+    response = backend_client.post("user_view", json={"Username": mobile_api})
+    if response.status_code != 200:
+        logger.error(f"User View API returned {response.status_code} for {mobile_api}.")
+        return None
+
+    api_response = response.json()
+    if api_response.get("SuccessFlag") == "true" and api_response.get("Message"):
+        profile = api_response["Message"][0]
+        profile_cache.set(mobile_api, profile)
+        return profile
+
+    # Unregistered numbers are cached for a shorter time so a new registration is seen quickly
+    profile_cache.set(mobile_api, NOT_REGISTERED, ttl=settings.profile_cache_negative_ttl)
+    return None
+
+
+def invalidate_user_profile(mobile_api: str):
+    """Drops the cached profile, e.g. after the user registers or changes their details."""
+    profile_cache.invalidate(mobile_api)
@@ -1,9 +1,8 @@
-from twilio.rest import Client
-from config import load_config
-
 # Import utilities
-from utils.messaging_utils import clean_mobile_number_for_api, format_mobile_for_twilio
+from utils.messaging_utils import clean_mobile_number_for_api, format_mobile_for_twilio, send_whatsapp_message, PRIORITY_HIGH
+from utils.resilience import BackendUnavailableError
 from utils.logger import app_logger as logger
+from utils.metrics import registry
 
 # Import new_user
 from new_user.new_user_reg import handle_greeting, handle_user_registration_flow
@@ -11,7 +10,7 @@ from new_user.user_address import add_new_address
 from new_user.book_presc import booking_with_prescription
 
 # Import state manager
-from state.state_manager import user_registration_state
+from state.state_manager import user_registration_state, state_store
 
 # Import existing_user
 from booking.self_booking import add_patient_flow_self
@@ -22,17 +21,7 @@ from existing_user.existing_user import handle_user_interaction
 
 from booking.other_booking import add_patient_flow_others
 from booking.add_family import add_family_member
-# Load configuration
-logger.info("Loading configuration.")
-config = load_config()
-
-# WhatsApp configurations
-account_sid = config['account_sid']
-auth_token = config['auth_token']
-twilio_whatsapp_number = config['phone_number']
 
-# Initialize Twilio client
-client = Client(account_sid, auth_token)
 
 # Core Function: Process Messages
 def process_message(mobile: str, message: str, request_data: dict) -> dict:
@@ -43,70 +32,132 @@ def process_message(mobile: str, message: str, request_data: dict) -> dict:
     mobile_api = clean_mobile_number_for_api(mobile)
     mobile_twilio = format_mobile_for_twilio(mobile)
 
-    # Handle greeting: Reset state and restart
-    if message.lower().strip() in ["hi", "hello"]:
-        logger.info(f"User {mobile_api} said 'hi'. Restarting the conversation.")
-        if mobile_api in user_registration_state:
-            del user_registration_state[mobile_api]
-        return handle_greeting(mobile_api, mobile_twilio)
+    # Load the user's state once and write it back in one operation when the step is done
+    with state_store.session(mobile_api):
+        return route_message(mobile_api, mobile_twilio, message, request_data)
+
+
+# Per-step latency and unhandled traffic, exported through utils.metrics.registry
+step_seconds = registry.histogram(
+    "chatbot_step_seconds", "Time spent handling one message, by conversation action and step.", ("action", "step")
+)
+backend_fallbacks = registry.counter(
+    "chatbot_backend_fallbacks_total", "Messages answered with the busy message because a backend refused the call, by action.", ("action",)
+)
+unhandled_messages = registry.counter(
+    "chatbot_unhandled_messages_total", "Messages that matched no handler, by conversation action.", ("action",)
+)
+
+# Sent when a step fails because a backend's circuit is open or its bulkhead is full; the state is left as it was
+BACKEND_BUSY_MESSAGE = "Our service is busy right now. Please try again in a few minutes."
+
+# (action, step) -> handler(mobile_api, mobile_twilio, message, request_data).
+# A step of None registers the handler for every step of the action; an exact (action, step) entry takes precedence.
+ROUTES = {}
+
+
+def route(action: str, step: str = None):
+    """Registers the decorated function as the handler for an action, or for one step of it."""
+    def register(handler):
+        ROUTES[(action, step)] = handler
+        return handler
+    return register
+
 
-    # Check user's current state
-    user_state = user_registration_state.get(mobile_api, {})
-    action = user_state.get("action")
+@route("greeting")
+def _greeting(mobile_api, mobile_twilio, message, request_data):
+    # Reset state and restart
+    logger.info(f"User {mobile_api} said 'hi'. Restarting the conversation.")
+    if mobile_api in user_registration_state:
+        del user_registration_state[mobile_api]
+    return handle_greeting(mobile_api, mobile_twilio)
 
-    # Handle existing user interactions
-    if action == "existing_user":
-        logger.info(f"User {mobile_api} selected option: {message.strip()}")
-        return handle_user_interaction(mobile_api, mobile_twilio, message.strip())
 
-    if action == "user_registration":
-        # Handle user registration flow
-        registration_response = handle_user_registration_flow(mobile_api, mobile_twilio, message)
-        if registration_response.get("status") == "success" and "registration successful" in registration_response.get("message", "").lower():
-            # Automatically transition to Add Patient
-            logger.info(f"Registration successful for {mobile_api}. Transitioning to Add Patient flow.")
-            return add_patient_flow_self(mobile_api, mobile_twilio)
-        return registration_response
+@route("existing_user")
+def _existing_user(mobile_api, mobile_twilio, message, request_data):
+    logger.info(f"User {mobile_api} selected option: {message.strip()}")
+    return handle_user_interaction(mobile_api, mobile_twilio, message.strip())
 
 
+@route("user_registration")
+def _user_registration(mobile_api, mobile_twilio, message, request_data):
+    registration_response = handle_user_registration_flow(mobile_api, mobile_twilio, message)
+    if registration_response.get("status") == "success" and "registration successful" in registration_response.get("message", "").lower():
+        # Automatically transition to Add Patient
+        logger.info(f"Registration successful for {mobile_api}. Transitioning to Add Patient flow.")
+        return add_patient_flow_self(mobile_api, mobile_twilio)
+    return registration_response
 
-    elif action == "booking_person":
-        return add_patient_flow_self(mobile_api, mobile_twilio, message)
 
-    elif action == "other_booking":
-        return add_patient_flow_others(mobile_api, mobile_twilio, message, request_data)
-    
-    elif action == "family_member_booking":
-        return add_family_member(mobile_api, mobile_twilio, message)
+@route("booking_person")
+def _booking_person(mobile_api, mobile_twilio, message, request_data):
+    return add_patient_flow_self(mobile_api, mobile_twilio, message)
 
 
-    elif action == "add_new_address":
-        # Handle Add Address flow
-        return add_new_address(mobile_api, mobile_twilio, message)
+@route("other_booking")
+def _other_booking(mobile_api, mobile_twilio, message, request_data):
+    return add_patient_flow_others(mobile_api, mobile_twilio, message, request_data)
 
 
-    elif action == "booking_with_prescription":
-        # Handle Booking with Prescription flow
-        return booking_with_prescription(mobile_api, mobile_twilio, message, request_data)
+@route("family_member_booking")
+def _family_member_booking(mobile_api, mobile_twilio, message, request_data):
+    return add_family_member(mobile_api, mobile_twilio, message)
 
 
+@route("add_new_address")
+def _add_new_address(mobile_api, mobile_twilio, message, request_data):
+    return add_new_address(mobile_api, mobile_twilio, message)
 
-    elif action == "download_report":
-        # Handle Download Report flow
-        return handle_download_report(mobile_api, mobile_twilio, message)
 
-    elif action == "booking_details":
-        # Handle Booking Details flow
-        return booking_details(mobile_api, mobile_twilio, message)
+@route("booking_with_prescription")
+def _booking_with_prescription(mobile_api, mobile_twilio, message, request_data):
+    return booking_with_prescription(mobile_api, mobile_twilio, message, request_data)
 
-    elif action == "existing_address":
-        # Handle Address Flow
-        logger.debug(f"Routing to existing_user_address for {mobile_api}. Current state: {user_registration_state.get(mobile_api)}")
-        return existing_user_address(mobile_api, mobile_twilio, message)
 
-    # Fallback for unrecognized input
-    logger.warning(f"Unhandled message from {mobile_api}: {message}")
-    return {
-        "status": "ignored",
-        "message": "Type 'hi' to start the conversation."
-    }
+@route("download_report")
+def _download_report(mobile_api, mobile_twilio, message, request_data):
+    return handle_download_report(mobile_api, mobile_twilio, message)
+
+
+@route("booking_details")
+def _booking_details(mobile_api, mobile_twilio, message, request_data):
+    return booking_details(mobile_api, mobile_twilio, message)
+
+
+@route("existing_address")
+def _existing_address(mobile_api, mobile_twilio, message, request_data):
+    logger.debug("Routing to existing_user_address for %s. Current state: %s", mobile_api, user_registration_state.get(mobile_api))
+    return existing_user_address(mobile_api, mobile_twilio, message)
+
+
+def route_message(mobile_api: str, mobile_twilio: str, message: str, request_data: dict) -> dict:
+    """
+    Routes the message to the handler registered for the user's current action and step,
+    timing the handler into chatbot_step_seconds. A backend that refuses calls gets the user a busy message.
+    """
+    if message.lower().strip() in ["hi", "hello"]:
+        action, step = "greeting", None
+    else:
+        # Check user's current state
+        user_state = user_registration_state.get(mobile_api, {})
+        action, step = user_state.get("action"), user_state.get("step")
+
+    handler = ROUTES.get((action, step)) or ROUTES.get((action, None))
+    if handler is None:
+        # Fallback for unrecognized input
+        unhandled_messages.inc(action=action or "none")
+        logger.warning(f"Unhandled message from {mobile_api}: {message}")
+        return {
+            "status": "ignored",
+            "message": "Type 'hi' to start the conversation."
+        }
+
+    try:
+        with step_seconds.time(action=action, step=step or "none"):
+            return handler(mobile_api, mobile_twilio, message, request_data)
+    except BackendUnavailableError as e:
+        # Flows without their own RequestException handling still answer at once
+        backend_fallbacks.inc(action=action or "none")
+        logger.warning(f"Backend unavailable for {mobile_api} at {action}/{step}: {e}")
+        send_whatsapp_message(mobile_twilio, body=BACKEND_BUSY_MESSAGE, priority=PRIORITY_HIGH)
+        return {"status": "error", "message": BACKEND_BUSY_MESSAGE}
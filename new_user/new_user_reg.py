@@ -5,21 +5,15 @@ from datetime import datetime, date
 from config import load_config
 from state.state_manager import user_registration_state
 from utils.logger import app_logger as logger
+from utils.api_client import backend_client
 from utils.messaging_utils import send_whatsapp_message,format_mobile_for_twilio
 from existing_user.existing_user import handle_user_interaction
-from twilio.rest import Client
+from helper_functions.user_profile import get_user_profile, invalidate_user_profile
 
 config = load_config()
-user_view_api = config['user_view']
-user_registration_api = config['user_registration']
-account_sid = config['account_sid']
-auth_token = config['auth_token']
-twilio_whatsapp_number = config['phone_number']
 
 # Twilio SID
 gender_new_user = config['gender_new_user']
-# Initiate Twilio Client
-client = Client(account_sid, auth_token)
 
 
 def handle_greeting(mobile_api: str, mobile_twilio: str) -> dict:
@@ -27,8 +21,6 @@ def handle_greeting(mobile_api: str, mobile_twilio: str) -> dict:
     Handles user greeting and checks registration status.
     Redirects existing users to existing_user.py and starts registration for new users.
     """
-    api_payload = {"Username": mobile_api}
-
     # Reset user state to restart
     if mobile_api in user_registration_state:
         logger.info(f"Resetting state for user: {mobile_api}.")
@@ -36,10 +28,10 @@ def handle_greeting(mobile_api: str, mobile_twilio: str) -> dict:
 
     try:
         logger.info(f"Checking user registration status for {mobile_api}.")
-        response = requests.post(user_view_api, json=api_payload)
+        profile = get_user_profile(mobile_api)
 
         # If user is found, redirect to existing_user.py
-        if response.status_code == 200 and response.json().get("SuccessFlag") == "true":
+        if profile:
             logger.info(f"User {mobile_api} found. Redirecting to existing_user.py.")
             return handle_user_interaction(mobile_api, mobile_twilio)
 
@@ -113,13 +105,9 @@ def handle_user_registration_flow(mobile_api: str, mobile_twilio: str, message:
 
 
             # Send the quick reply template using content SID
-            message = client.messages.create(
-                from_=twilio_whatsapp_number,
-                to=to,
-                content_sid=gender_new_user
-            )
-            logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-            return {"status": "success", "message_sid": message.sid}
+            send_whatsapp_message(to, content_sid=gender_new_user)
+            logger.info(f"Quick reply template sent to {to}")
+            return {"status": "success", "message": "Quick reply template sent."}
         except ValueError as ve:
             logger.error(f"Invalid mobile number provided: {ve}")
             return {"status": "error", "error": str(ve)}
@@ -139,13 +127,9 @@ def handle_user_registration_flow(mobile_api: str, mobile_twilio: str, message:
 
 
                 # Send the quick reply template using content SID
-                message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=to,
-                    content_sid=gender_new_user
-                )
-                logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-                return {"status": "success", "message_sid": message.sid}
+                send_whatsapp_message(to, content_sid=gender_new_user)
+                logger.info(f"Quick reply template sent to {to}")
+                return {"status": "success", "message": "Quick reply template sent."}
             except ValueError as ve:
                 logger.error(f"Invalid mobile number provided: {ve}")
                 return {"status": "error", "error": str(ve)}
@@ -173,7 +157,7 @@ def handle_user_registration_flow(mobile_api: str, mobile_twilio: str, message:
         try:
             dob = message.strip()
             normalized_dob = dob.replace("-", "/")
-            logger.debug(f"DOB normalized: {normalized_dob}")
+            logger.debug("DOB normalized: %s", normalized_dob)
             parsed_dob = datetime.strptime(normalized_dob, "%d/%m/%Y").date()
 
             if parsed_dob > date.today():
@@ -203,20 +187,21 @@ def handle_user_registration_flow(mobile_api: str, mobile_twilio: str, message:
                 "DOB": state["dob"],
                 "Mobile_No": mobile_api  # Automatically taken from WhatsApp number
             }
-            logger.info(f"Submitting user registration payload: {payload}")
+            logger.info("Submitting user registration payload: %s", payload)
 
             # Make API call to User_Registration
-            response = requests.post(user_registration_api, json=payload)
+            response = backend_client.post("user_registration", json=payload)
 
             if response.status_code == 200 and response.json().get("SuccessFlag") == "true":
                 response_message = "Registration successful!\n"
                 send_whatsapp_message(mobile_twilio, body=response_message)
                 del user_registration_state[mobile_api]  # Clear the state
+                invalidate_user_profile(mobile_api)
                 logger.info(f"User registration successful for {mobile_api}")
                 return {"status": "success", "message": response_message}
             else:
                 response_message = "Registration failed. Please try again later."
-                logger.error(f"User registration failed: {response.text}")
+                logger.error("User registration failed: %s", response.text)
                 send_whatsapp_message(mobile_twilio, body=response_message)
                 return {"status": "error", "message": response_message}
             
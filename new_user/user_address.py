@@ -1,22 +1,16 @@
 # new_user/user_add.py
 
-import requests
 from config import load_config
 from state.state_manager import user_registration_state
-from twilio.rest import Client
 from utils.logger import app_logger as logger
+from utils.api_client import backend_client
 from utils.messaging_utils import send_whatsapp_message, format_mobile_for_twilio
+from helper_functions.user_addresses import invalidate_user_addresses
 from new_user.book_presc import booking_with_prescription
 
 # Load configuration
 config = load_config()
-add_address_api = config['add_user_address_api']
-account_sid = config['account_sid']
-auth_token = config['auth_token']
-twilio_whatsapp_number = config['phone_number']
 
-# Initialize Twilio Client
-client = Client(account_sid, auth_token)
 
 
 province_sid = config['province_sid']
@@ -70,13 +64,9 @@ def add_new_address(mobile_api: str, mobile_twilio: str, message: str = None) ->
 
         try:
             to = format_mobile_for_twilio(mobile_twilio)
-            message = client.messages.create(
-                from_=twilio_whatsapp_number,
-                to=to,
-                content_sid=province_sid
-            )
-            logger.info(f"Quick reply template sent to {to} with SID: {message.sid}")
-            return {"status": "success", "message_sid": message.sid}
+            send_whatsapp_message(to, content_sid=province_sid)
+            logger.info(f"Quick reply template sent to {to}")
+            return {"status": "success", "message": "Quick reply template sent."}
         except Exception as e:
             logger.error(f"Failed to send province options: {e}")
             return {"status": "error", "error": str(e)}
@@ -93,12 +83,8 @@ def add_new_address(mobile_api: str, mobile_twilio: str, message: str = None) ->
         if not province:
             try:
                 to = format_mobile_for_twilio(mobile_twilio)
-                message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=to,
-                    content_sid=province_sid
-                )
-                return {"status": "success", "message_sid": message.sid}
+                send_whatsapp_message(to, content_sid=province_sid)
+                return {"status": "success", "message": "Quick reply template sent."}
             except Exception as e:
                 return {"status": "error", "error": str(e)}
 
@@ -110,12 +96,8 @@ def add_new_address(mobile_api: str, mobile_twilio: str, message: str = None) ->
         # address Confirmation
         try:
             to = format_mobile_for_twilio(mobile_twilio)
-            message = client.messages.create(
-                from_=twilio_whatsapp_number,
-                to=to,
-                content_sid=user_address_confirmation
-            )
-            return {"status": "success", "message_sid": message.sid}
+            send_whatsapp_message(to, content_sid=user_address_confirmation)
+            return {"status": "success", "message": "Quick reply template sent."}
         except Exception as e:
             return {"status": "error", "error": str(e)}
 
@@ -146,7 +128,9 @@ def add_new_address(mobile_api: str, mobile_twilio: str, message: str = None) ->
                 "Longitude": "79.125487"
             }
 
-            response = requests.post(add_address_api, json=payload)
+            response = backend_client.post("add_user_address_api", json=payload)
+            # Whatever the outcome, the cached addresses may no longer match the backend
+            invalidate_user_addresses(mobile_api)
             if response.status_code == 200 and response.json().get("SuccessFlag") == "true":
                 response_message = "Your address has been added successfully!"
                 send_whatsapp_message(mobile_twilio, body=response_message)
@@ -173,11 +157,7 @@ def add_new_address(mobile_api: str, mobile_twilio: str, message: str = None) ->
             # address Confirmation
             try:
                 to = format_mobile_for_twilio(mobile_twilio)
-                message = client.messages.create(
-                    from_=twilio_whatsapp_number,
-                    to=to,
-                    content_sid=user_address_confirmation
-                )
-                return {"status": "success", "message_sid": message.sid}
+                send_whatsapp_message(to, content_sid=user_address_confirmation)
+                return {"status": "success", "message": "Quick reply template sent."}
             except Exception as e:
                 return {"status": "error", "error": str(e)}
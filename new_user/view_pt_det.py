@@ -2,14 +2,10 @@
 
 import requests
 
-from config import load_config
 from utils.logger import app_logger as logger
+from utils.api_client import backend_client
 from utils.messaging_utils import send_whatsapp_message
 
-config = load_config()
-
-patient_list_api = config['fetch_pt_list']
-
 
 def fetch_patient_details(username: str, mobile_twilio: str, user_state: dict) -> dict:
     """
@@ -17,7 +13,7 @@ def fetch_patient_details(username: str, mobile_twilio: str, user_state: dict) -
     """
     logger.info(f"Fetching patient details for {username}.")
     try:
-        response = requests.post(patient_list_api, json={"Username": username})
+        response = backend_client.post("fetch_pt_list", json={"Username": username})
 
         # If the user is not found (404)
         if response.status_code == 404:
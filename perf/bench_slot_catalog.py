@@ -0,0 +1,78 @@
+# perf/bench_slot_catalog.py
+
+"""
+Micro-benchmark for the choose_slot step: resolving a slot item ID to its IST visit time.
+
+"legacy" repeats what the booking flows did per message before the slot catalog: build the
+slot_mappings dict, split the label, strptime both ends and combine them with ZoneInfo("Asia/Kolkata").
+"catalog" is slot_catalog.get() + slot_catalog.visit_time(); "bookable" is the per-period filter.
+
+Example:
+    python perf/bench_slot_catalog.py --number 20000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from helper_functions.slot_catalog import IST, SLOT_DEFINITIONS, slot_catalog  # noqa: E402
+
+
+def legacy_visit_time(period: str, item_id: str, visit_date, current_time):
+    slot_mappings = {period_name: dict(items) for period_name, items in SLOT_DEFINITIONS.items()}
+    selected_slot = slot_mappings.get(period, {}).get(item_id)
+    india_timezone = ZoneInfo("Asia/Kolkata")
+    start_time_12hr = selected_slot.split(" ")[0] + " " + selected_slot.split(" ")[1]
+    end_time_12hr = selected_slot.split(" ")[3] + " " + selected_slot.split(" ")[4]
+    start_time_naive = datetime.strptime(start_time_12hr, "%I %p")
+    end_time_naive = datetime.strptime(end_time_12hr, "%I %p")
+    start_time_ist = datetime.combine(visit_date, start_time_naive.time(), india_timezone)
+    end_time_ist = datetime.combine(visit_date, end_time_naive.time(), india_timezone)
+    if visit_date == current_time.date():
+        if current_time < start_time_ist:
+            return (start_time_ist + timedelta(minutes=40)).strftime("%H:%M")
+        if start_time_ist <= current_time <= end_time_ist:
+            return (current_time + timedelta(minutes=40)).strftime("%H:%M")
+        return None
+    return (start_time_ist + timedelta(minutes=40)).strftime("%H:%M")
+
+
+def catalog_visit_time(period: str, item_id: str, visit_date, current_time):
+    return slot_catalog.visit_time(slot_catalog.get(period, item_id), visit_date, current_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="lookups per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements; the fastest is reported")
+    args = parser.parse_args()
+
+    now = datetime.now(IST).replace(hour=13, minute=20)
+    cases = [(period, item_id) for period, items in SLOT_DEFINITIONS.items() for item_id in items]
+    for visit_date in (now.date(), now.date() + timedelta(days=1)):
+        for period, item_id in cases:
+            assert legacy_visit_time(period, item_id, visit_date, now) == catalog_visit_time(period, item_id, visit_date, now)
+
+    def run(func):
+        def lookups():
+            for period, item_id in cases:
+                func(period, item_id, now.date(), now)
+        best = min(timeit.repeat(lookups, number=max(1, args.number // len(cases)), repeat=args.repeat))
+        return best / (max(1, args.number // len(cases)) * len(cases)) * 1e6
+
+    legacy = run(legacy_visit_time)
+    catalog = run(catalog_visit_time)
+    bookable = run(lambda period, item_id, visit_date, current_time: slot_catalog.bookable(period, visit_date, current_time))
+    print(f"legacy   {legacy:8.2f} us/lookup")
+    print(f"catalog  {catalog:8.2f} us/lookup  ({legacy / catalog:.1f}x faster)")
+    print(f"bookable {bookable:8.2f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
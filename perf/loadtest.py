@@ -0,0 +1,608 @@
+# perf/loadtest.py
+
+"""
+Load test for the /chatbot webhook.
+
+Runs the FastAPI app in-process and drives it with Twilio-style form posts (From, Body, MediaUrl0).
+The patient-app API, db_api, Twilio media and the Twilio Messages API are replaced by local stub
+servers with configurable latency, so every flow in main.route_message runs end to end.
+It reports throughput and p50/p95/p99 webhook latency per flow and per conversation step.
+
+Examples:
+    python perf/loadtest.py --users 50 --conversations 500
+    python perf/loadtest.py --flows self_booking,download_report --backend-latency 0.2 --twilio-latency 0.3
+    python perf/loadtest.py --dump traffic.jsonl --conversations 20
+    python perf/loadtest.py --replay traffic.jsonl --users 20
+    python perf/loadtest.py --set server.worker_threads=400 --set messaging.send_workers=16
+
+Replay files are JSON lines with the webhook form fields, e.g.
+    {"From": "whatsapp:+919000000001", "Body": "hi", "MediaUrl0": "", "flow": "self_booking"}
+Messages from the same From are sent in order, one at a time; different numbers run concurrently.
+A MediaUrl0 of "stub" is replaced with the stub media URL.
+
+Requires httpx (pip install httpx).
+"""
+
+import argparse
+import asyncio
+import configparser
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx  # noqa: E402
+
+
+# --------------------------------------------------------------------------- stub backends
+
+class StubBackend:
+    """
+    Answers every backend endpoint the flows call, keyed on the first path segment.
+    Keeps just enough per-number state (registration, address, patients, bookings) for conversations to complete.
+    """
+
+    def __init__(self, latency: float, twilio_latency: float, jitter: float, endpoint_latency: dict, media_bytes: int):
+        self.latency = latency
+        self.twilio_latency = twilio_latency
+        self.jitter = jitter
+        self.endpoint_latency = endpoint_latency
+        self.media = b"\xff\xd8\xff\xe0" + os.urandom(max(0, media_bytes - 4))
+        self.unregistered = set()
+        self.without_address = set()
+        self.patients = defaultdict(list)
+        self.bookings = defaultdict(int)
+        self.calls = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def delay(self, endpoint: str):
+        base = self.endpoint_latency.get(endpoint, self.twilio_latency if endpoint == "twilio" else self.latency)
+        if base > 0 or self.jitter > 0:
+            time.sleep(max(0.0, base + random.uniform(-self.jitter, self.jitter)))
+
+    def handle(self, method: str, path: str, body: bytes) -> tuple:
+        parts = path.split("?")[0].strip("/").split("/")
+        endpoint = "twilio" if parts[0] == "2010-04-01" else parts[0]
+        with self._lock:
+            self.calls[endpoint] += 1
+        self.delay(endpoint)
+
+        if endpoint == "twilio":
+            return 201, "application/json", json.dumps({"sid": "SM" + uuid.uuid4().hex, "status": "queued"}).encode()
+        if endpoint == "media":
+            return 200, "image/jpeg", self.media
+
+        payload = {}
+        if body and not endpoint.startswith("booking_presc"):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = {}
+        username = payload.get("Username") or payload.get("UserName") or payload.get("mobile_api") or ""
+        handler = getattr(self, f"_{endpoint}", None)
+        if handler is None:
+            return 404, "application/json", b'{"SuccessFlag": "false", "Message": [{"Message": "Unknown endpoint"}]}'
+        status, response = handler(username, payload, body, parts)
+        return status, "application/json", json.dumps(response).encode()
+
+    def _user_view(self, username, payload, body, parts):
+        if username in self.unregistered:
+            return 200, {"SuccessFlag": "false", "Code": 404, "Message": [{"Message": "User not found"}]}
+        return 200, {"SuccessFlag": "true", "Code": 200, "Message": [{
+            "Name": "Load Test", "First_Name": "Load", "Sur_Name": "Test", "User_Gender": "M",
+            "User_DOB": "1990/01/01", "User_Mobile_No": username,
+        }]}
+
+    def _user_registration(self, username, payload, body, parts):
+        self.unregistered.discard(username)
+        return 200, {"SuccessFlag": "true", "Code": 200, "Message": [{"Message": "Registered"}]}
+
+    def _fetch_pt_list(self, username, payload, body, parts):
+        patients = self.patients[username] or [f"PT{username[-6:]}01"]
+        return 200, {"SuccessFlag": "true", "Code": 200, "Message": [{"Patient_Detail": [
+            {"Pt_Name": f"Patient {idx}", "Pt_Code": code, "Pt_First_Age": 30 + idx,
+             "Pt_First_Age_Period": "Years", "Pt_Gender": "F"}
+            for idx, code in enumerate(patients, 1)
+        ]}]}
+
+    def _add_patient(self, username, payload, body, parts):
+        code = f"PT{username[-6:]}{len(self.patients[username]) + 1:02d}"
+        self.patients[username].append(code)
+        return 200, {"SuccessFlag": "true", "Code": 200, "Message": [{"Patient_Code": code}]}
+
+    def _user_address(self, username, payload, body, parts):
+        self.without_address.discard(username)
+        return 200, {"SuccessFlag": "true", "Code": 200, "Message": [{"Message": "Address added"}]}
+
+    def _get_user_address(self, username, payload, body, parts):
+        if username in self.without_address:
+            return 200, {"SuccessFlag": "False", "Code": 404, "Message": [{"User_Address": []}]}
+        return 200, {"SuccessFlag": "True", "Code": 200, "Message": [{"User_Address": [
+            {"Full_Address": "12, Sunshine Apartment, Abha Street, Riyadh 13525"}
+        ]}]}
+
+    def _edit_user_address(self, username, payload, body, parts):
+        return 200, {"SuccessFlag": "true", "Code": 200, "Message": [{"Message": "Address updated"}]}
+
+    def _booking_presc(self, username, payload, body, parts):
+        match = re.search(rb'name="UserName"\r\n\r\n(\d+)', body or b"")
+        if match:
+            with self._lock:
+                self.bookings[match.group(1).decode()] += 1
+        return 200, {"SuccessFlag": "true", "Code": 200, "Message": [{"Booking_No": f"BK{uuid.uuid4().int % 10**12:012d}"}]}
+
+    def _booking_list(self, username, payload, body, parts):
+        today = date.today()
+        return 200, {"SuccessFlag": "true", "Code": 200, "Message": [{"Booking_Detail": [
+            {"Booking_No": f"BK{username[-6:]}{idx:02d}", "Booking_Date": (today - timedelta(days=idx * 7)).strftime("%Y/%m/%d"),
+             "Pt_Name": f"Patient {idx}", "Report_Status": "Completed", "Booking_Status_Desc": "Confirmed",
+             "Branch_Name": "Main Branch"}
+            for idx in range(1, 6)
+        ]}]}
+
+    def _download_reports(self, username, payload, body, parts):
+        booking_id = parts[-1]
+        if booking_id.endswith("02"):
+            # Booking 02 of every user has no report yet
+            return 404, {"detail": "Report not found"}
+        return 200, {"pdf_url": f"https://reports.example.com/{booking_id}.pdf"}
+
+    def _save_booking(self, username, payload, body, parts):
+        return 200, {"message": "Booking saved"}
+
+    def _get_booking(self, username, payload, body, parts):
+        return 200, {"bookings": []}
+
+    def _check_nationality(self, username, payload, body, parts):
+        return 200, {"nationality": "Saudi"}
+
+    def _check_surname(self, username, payload, body, parts):
+        return 200, {"surname": None}
+
+    def _save_user_details(self, username, payload, body, parts):
+        return 200, {"message": "User details saved successfully"}
+
+    def _update_nationality(self, username, payload, body, parts):
+        return 200, {"message": "Nationality updated"}
+
+
+def start_stub_server(backend: StubBackend) -> ThreadingHTTPServer:
+    """Serves the stub backend over keep-alive HTTP/1.1 on a free local port."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _read_body(self) -> bytes:
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                chunks = []
+                while True:
+                    size = int(self.rfile.readline().strip() or b"0", 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        return b"".join(chunks)
+                    chunks.append(self.rfile.read(size))
+                    self.rfile.readline()
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _serve(self):
+            status, content_type, data = backend.handle(self.command, self.path, self._read_body())
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = _serve
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, name="stub-backend", daemon=True).start()
+    return server
+
+
+def write_stub_config(stub_url: str, overrides: list) -> str:
+    """Writes a config.ini pointing every endpoint at the stub server and returns its path."""
+    config = configparser.ConfigParser()
+    config["twilio"] = {"account_sid": "AC" + "0" * 32, "auth_token": "loadtest", "phone_number": "whatsapp:+10000000000"}
+    config["apis"] = {"base_url": stub_url}
+    for key, path in {
+        "user_registration": "user_registration", "user_view": "user_view", "fetch_pt_list": "fetch_pt_list",
+        "add_patient": "add_patient", "user_address_api": "user_address", "show_address_api": "show_address",
+        "booking_presc_api": "booking_presc", "booking_slot": "booking_slot", "booking_details": "booking_details",
+        "branch_details": "branch_details", "invoice": "invoice", "booking_list": "booking_list",
+        "edit_user_address_api": "edit_user_address", "get_user_address_api": "get_user_address",
+    }.items():
+        config["apis"][key] = f"/{path}"
+    config["db_api"] = {"base_url": stub_url}
+    for key, path in {
+        "get_booking_api": "get_booking", "save_booking_url": "save_booking", "download_reports": "download_reports",
+        "check_nationality_api": "check_nationality", "save_user_details_api": "save_user_details",
+        "update_nationality_api": "update_nationality", "check_surname_api": "check_surname",
+    }.items():
+        config["db_api"][key] = f"/{path}"
+    config["content_sid"] = {
+        name: f"HX{idx:032d}" for idx, name in enumerate([
+            "existing_user_options_sid", "relationship_sid", "nationality_sid", "patient_nationality_someone",
+            "someone_else_relationship", "someone_else_gender", "existing_address", "booking_options_sid",
+            "day_slot_sid", "gender_new_user", "morning_slot_sid", "afternoon_slot_sid", "evening_slot_sid",
+            "booking_details_sid", "province_sid", "user_address_confirmation", "add_family_patient",
+        ])
+    }
+    # Background jobs go to a throwaway database
+    config["jobs"] = {"path": os.path.join(tempfile.gettempdir(), f"chatbot-loadtest-{uuid.uuid4().hex}.sqlite3")}
+
+    for override in overrides:
+        key, _, value = override.partition("=")
+        section, _, option = key.partition(".")
+        if not config.has_section(section):
+            config.add_section(section)
+        config[section][option] = value
+
+    fd, path = tempfile.mkstemp(prefix="chatbot-loadtest-", suffix=".ini")
+    with os.fdopen(fd, "w") as config_file:
+        config.write(config_file)
+    return path
+
+
+# --------------------------------------------------------------------------- conversations
+
+MEDIA = object()
+
+# Scripted conversations, one per action branch in main.route_message.
+# "new_user": number starts unregistered; "no_address": number starts without a saved address.
+FLOWS = {
+    "registration": {
+        "new_user": True, "no_address": True, "expect": "booking",
+        "script": ["hi", "Load Test", "MALE", "01/01/1990", "Self",
+                   "12, Sunshine Apartment", "Abha Street", "13525", "1", "Yes",
+                   "Home Collection", "{visit_date}", "Morning", "1", MEDIA],
+    },
+    "self_booking": {
+        "expect": "booking",
+        "script": ["hi", "New booking", "Self", "Yes", "Walk In", "{visit_date}", "Afternoon", "2", MEDIA],
+    },
+    "existing_address": {
+        "expect": "booking",
+        "script": ["hi", "New booking", "Self", "No", "14, Palm Residency", "King Fahd Road", "12345", "2", "Yes",
+                   "Home Collection", "{visit_date}", "Morning", "2", MEDIA],
+    },
+    "other_booking": {
+        "expect": "booking",
+        "script": ["hi", "New booking", "Someone else", "1", "Home Collection", "{visit_date}", "Evening", "1", MEDIA],
+    },
+    "family_member_booking": {
+        "expect": "booking",
+        "script": ["hi", "New booking", "Someone else", "Add patient", "1", "Jane Doe", "Yes", "01/01/1960",
+                   "female", "9876500000", "Yes", "Home Collection", "{visit_date}", "Morning", "3", MEDIA],
+    },
+    "booking_details": {
+        "expect": "success",
+        "script": ["hi", "Booking details", "1"],
+    },
+    "download_report": {
+        "expect": "success",
+        "script": ["hi", "Download reports", "3", "2"],  # "3" is the "More bookings" button
+    },
+}
+
+
+def build_messages(flow: str, media_url: str) -> list:
+    """Returns the form posts for one conversation of `flow`."""
+    visit_date = (date.today() + timedelta(days=1)).strftime("%d/%m/%Y")
+    messages = []
+    for item in FLOWS[flow]["script"]:
+        if item is MEDIA:
+            messages.append({"Body": "", "MediaUrl0": media_url})
+        else:
+            messages.append({"Body": item.format(visit_date=visit_date), "MediaUrl0": ""})
+    return messages
+
+
+# --------------------------------------------------------------------------- measurement
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(values) + 0.5)))
+    return values[min(rank, len(values)) - 1]
+
+
+class Recorder:
+    """Collects webhook latencies per flow and per (flow, action:step)."""
+
+    def __init__(self):
+        self.by_flow = defaultdict(list)
+        self.by_step = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.conversations = defaultdict(int)
+        self.completed = defaultdict(int)
+        self.conversation_seconds = defaultdict(list)
+        self.twiml_replies = 0
+
+    def message(self, flow: str, step: str, seconds: float, ok: bool):
+        self.by_flow[flow].append(seconds)
+        self.by_step[(flow, step)].append(seconds)
+        if not ok:
+            self.errors[flow] += 1
+
+    def conversation(self, flow: str, seconds: float, completed: bool):
+        self.conversations[flow] += 1
+        self.completed[flow] += int(completed)
+        self.conversation_seconds[flow].append(seconds)
+
+    @staticmethod
+    def _summary(values: list) -> dict:
+        values = sorted(values)
+        return {
+            "count": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": (values[-1] if values else 0.0) * 1000,
+        }
+
+    def summary(self, elapsed: float) -> dict:
+        total_messages = sum(len(values) for values in self.by_flow.values())
+        total_conversations = sum(self.conversations.values())
+        return {
+            "elapsed_seconds": elapsed,
+            "messages": total_messages,
+            "conversations": total_conversations,
+            "messages_per_second": total_messages / elapsed if elapsed else 0.0,
+            "conversations_per_second": total_conversations / elapsed if elapsed else 0.0,
+            "twiml_replies": self.twiml_replies,
+            "flows": {
+                flow: {
+                    **self._summary(values),
+                    "errors": self.errors[flow],
+                    "conversations": self.conversations[flow],
+                    "completed": self.completed[flow],
+                    "conversation_p50_ms": percentile(sorted(self.conversation_seconds[flow]), 50) * 1000,
+                }
+                for flow, values in sorted(self.by_flow.items())
+            },
+            "steps": {
+                f"{flow} | {step}": self._summary(values)
+                for (flow, step), values in sorted(self.by_step.items())
+            },
+        }
+
+
+def print_report(summary: dict, backend: StubBackend, app_stats: dict):
+    print()
+    print(f"{summary['conversations']} conversations, {summary['messages']} messages in {summary['elapsed_seconds']:.1f}s: "
+          f"{summary['conversations_per_second']:.1f} conversations/s, {summary['messages_per_second']:.1f} messages/s")
+    if summary["twiml_replies"]:
+        print(f"{summary['twiml_replies']} text replies returned as TwiML")
+
+    print()
+    print(f"{'flow':<24}{'convs':>7}{'done':>7}{'msgs':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'conv p50':>10}")
+    for flow, stats in summary["flows"].items():
+        print(f"{flow:<24}{stats['conversations']:>7}{stats['completed']:>7}{stats['count']:>7}{stats['errors']:>8}"
+              f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['conversation_p50_ms']:>10.1f}")
+
+    print()
+    print(f"{'flow | action:step':<64}{'msgs':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for step, stats in summary["steps"].items():
+        print(f"{step:<64}{stats['count']:>7}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+
+    print()
+    print("stub calls: " + ", ".join(f"{name}={count}" for name, count in sorted(backend.calls.items())))
+    for name, stats in app_stats.items():
+        print(f"{name}: {json.dumps(stats, default=str)}")
+
+
+# --------------------------------------------------------------------------- driver
+
+async def run_conversation(client, recorder, backend, state, flow: str, number: str, messages: list,
+                           expect: str, think_time: float):
+    mobile_api = number[-10:]
+    bookings_before = backend.bookings[mobile_api]
+    last_status = None
+    started = time.perf_counter()
+
+    for message in messages:
+        if message["Body"].lower().strip() in ("hi", "hello"):
+            step = "greeting"
+        else:
+            current = state.get(mobile_api) or {}
+            step = f"{current.get('action', '-')}:{current.get('step', '-')}"
+
+        form = {"From": number, "Body": message["Body"], "MediaUrl0": message.get("MediaUrl0", "")}
+        sent = time.perf_counter()
+        try:
+            response = await client.post("/chatbot", data=form)
+            ok = response.status_code == 200
+            if ok and response.headers.get("content-type", "").startswith("application/xml"):
+                # TwiML reply mode: the flow status comes in a header, the text replies in the body
+                result = {"status": response.headers.get("x-chatbot-status")}
+                recorder.twiml_replies += response.text.count("<Message>")
+            else:
+                result = response.json() if ok else None
+            last_status = result.get("status") if isinstance(result, dict) else None
+        except httpx.HTTPError:
+            ok = False
+            last_status = None
+        recorder.message(flow, step, time.perf_counter() - sent, ok)
+
+        if think_time:
+            await asyncio.sleep(random.uniform(0, 2 * think_time))
+
+    if expect == "booking":
+        completed = backend.bookings[mobile_api] > bookings_before
+    else:
+        completed = last_status == "success"
+    recorder.conversation(flow, time.perf_counter() - started, completed)
+
+
+def scripted_jobs(args, backend: StubBackend, media_url: str) -> list:
+    flows = args.flows.split(",") if args.flows else list(FLOWS)
+    unknown = [flow for flow in flows if flow not in FLOWS]
+    if unknown:
+        raise SystemExit(f"Unknown flows: {', '.join(unknown)}. Available: {', '.join(FLOWS)}")
+
+    jobs = []
+    first_number = random.randint(10**8, 9 * 10**8)
+    for idx in range(args.conversations):
+        flow = flows[idx % len(flows)]
+        mobile_api = f"9{(first_number + idx) % 10**9:09d}"
+        if FLOWS[flow].get("new_user"):
+            backend.unregistered.add(mobile_api)
+        if FLOWS[flow].get("no_address"):
+            backend.without_address.add(mobile_api)
+        jobs.append((flow, f"whatsapp:+91{mobile_api}", build_messages(flow, media_url), FLOWS[flow]["expect"]))
+    return jobs
+
+
+def replay_jobs(path: str, backend: StubBackend, media_url: str) -> list:
+    conversations = {}
+    with open(path) as replay_file:
+        for line in replay_file:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            number = record["From"]
+            flow = record.get("flow", "replay")
+            media = record.get("MediaUrl0", "")
+            if number not in conversations and flow in FLOWS:
+                # Start the number in the same backend state as the scripted flow it was recorded from
+                if FLOWS[flow].get("new_user"):
+                    backend.unregistered.add(number[-10:])
+                if FLOWS[flow].get("no_address"):
+                    backend.without_address.add(number[-10:])
+            entry = conversations.setdefault(number, (flow, []))
+            entry[1].append({"Body": record.get("Body", ""), "MediaUrl0": media_url if media == "stub" else media})
+    return [
+        (flow, number, messages, FLOWS[flow]["expect"] if flow in FLOWS else "success")
+        for number, (flow, messages) in conversations.items()
+    ]
+
+
+async def drive(args, jobs: list, backend: StubBackend) -> tuple:
+    from app import app, user_locks, inbound_limiter
+    from helper_functions.booking_sync import job_queue
+    from state.state_manager import user_registration_state, state_store
+    from utils.api_client import backend_client
+    from utils.messaging_utils import dispatcher
+
+    recorder = Recorder()
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def worker(client):
+        while True:
+            try:
+                flow, number, messages, expect = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await run_conversation(client, recorder, backend, user_registration_state, flow, number, messages,
+                                   expect, args.think_time)
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(args.users)))
+            elapsed = time.perf_counter() - started
+        await asyncio.to_thread(dispatcher.flush, 30.0)
+        await asyncio.to_thread(job_queue.drain, 30.0)
+        job_stats = await asyncio.to_thread(job_queue.stats)
+
+    app_stats = {
+        "backend_client": backend_client.stats()["endpoints"],
+        "twilio_dispatcher": dispatcher.stats(),
+        "state_store": state_store.stats(),
+        "user_locks": user_locks.stats(),
+        "job_queue": job_stats,
+        "inbound_throttle": inbound_limiter.stats(),
+    }
+    return recorder.summary(elapsed), app_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chatbot webhook against stubbed backends.")
+    parser.add_argument("--users", type=int, default=20, help="concurrent conversations")
+    parser.add_argument("--conversations", type=int, default=200, help="scripted conversations to run")
+    parser.add_argument("--flows", default="", help=f"comma-separated subset of: {', '.join(FLOWS)}")
+    parser.add_argument("--replay", help="JSONL file of webhook posts to replay instead of the scripted flows")
+    parser.add_argument("--dump", help="write the scripted traffic to this JSONL file (replay format)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds a user waits between messages")
+    parser.add_argument("--backend-latency", type=float, default=0.05, help="seconds per backend API call")
+    parser.add_argument("--twilio-latency", type=float, default=0.1, help="seconds per Twilio API call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform +/- seconds added to every stub call")
+    parser.add_argument("--latency", action="append", default=[], metavar="ENDPOINT=SECONDS",
+                        help="per-endpoint stub latency, e.g. booking_presc=0.8 (repeatable)")
+    parser.add_argument("--media-bytes", type=int, default=2 * 1024 * 1024, help="size of the stub prescription image")
+    parser.add_argument("--set", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="config.ini override for the app under test, e.g. server.worker_threads=400 (repeatable)")
+    parser.add_argument("--json", help="write the summary to this file as JSON")
+    parser.add_argument("--log-level", default="WARNING", help="app log level during the run")
+    args = parser.parse_args()
+
+    endpoint_latency = {}
+    for item in args.latency:
+        name, _, seconds = item.partition("=")
+        endpoint_latency[name] = float(seconds)
+
+    backend = StubBackend(args.backend_latency, args.twilio_latency, args.jitter, endpoint_latency, args.media_bytes)
+    server = start_stub_server(backend)
+    stub_url = f"http://127.0.0.1:{server.server_port}"
+    media_url = f"{stub_url}/media/prescription.jpg"
+
+    os.environ["CHATBOT_CONFIG"] = write_stub_config(stub_url, [f"logging.level={args.log_level}", *args.set])
+
+    from utils.logger import app_logger
+    app_logger.setLevel(args.log_level.upper())
+
+    # Send Twilio API calls to the stub instead of api.twilio.com
+    from utils import messaging_utils
+    messaging_utils.client.api.base_url = stub_url
+
+    if args.replay:
+        jobs = replay_jobs(args.replay, backend, media_url)
+    else:
+        jobs = scripted_jobs(args, backend, media_url)
+        if args.dump:
+            with open(args.dump, "w") as dump_file:
+                for flow, number, messages, _ in jobs:
+                    for message in messages:
+                        media = "stub" if message["MediaUrl0"] else ""
+                        dump_file.write(json.dumps({"From": number, "Body": message["Body"], "MediaUrl0": media, "flow": flow}) + "\n")
+
+    summary, app_stats = asyncio.run(drive(args, jobs, backend))
+    print_report(summary, backend, app_stats)
+
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump({"summary": summary, "app": app_stats}, json_file, indent=2, default=str)
+
+    server.shutdown()
+    os.unlink(os.environ["CHATBOT_CONFIG"])
+    from config import get_settings
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(get_settings().jobs_path + suffix):
+            os.unlink(get_settings().jobs_path + suffix)
+
+
+if __name__ == "__main__":
+    main()
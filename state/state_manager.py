@@ -1,7 +1,24 @@
 # state manager/ state_manager.py
 
-user_registration_state = {}
-relationship_state = {}
-self_state = {}
+from config import get_settings
+from state.store import StateNamespace, build_state_store
+from utils.metrics import registry
 
-    
\ No newline at end of file
+# Shared store behind every conversation-state namespace (memory or redis, see [state] in config.ini)
+state_store = build_state_store(get_settings())
+
+user_registration_state = StateNamespace(state_store, "user_registration")
+relationship_state = StateNamespace(state_store, "relationship")
+self_state = StateNamespace(state_store, "self")
+
+# Read at scrape time
+registry.gauge(
+    "chatbot_active_conversations", "Stored conversations by their current user_registration action.", ("action",),
+    callback=state_store.action_counts,
+)
+registry.gauge("chatbot_state_entries", "Conversation records held by the state store.", callback=lambda: len(state_store.keys()))
+if hasattr(state_store.backend, "stats"):
+    registry.gauge(
+        "chatbot_state_resident_bytes", "Estimated bytes held by in-memory conversation records.",
+        callback=lambda: state_store.stats()["resident_bytes"],
+    )
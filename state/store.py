@@ -0,0 +1,312 @@
+# state/store.py
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+from state.timing_wheel import TimingWheel
+
+try:
+    import msgpack
+except ImportError:  # Only needed by the Redis backend
+    msgpack = None
+
+
+def estimate_size(value) -> int:
+    """
+    Cheap estimate of the bytes held by a state value: string and binary payloads
+    count by length, containers add a small per-item overhead.
+    """
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value) + 48
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return 56 + sum(estimate_size(item) for item in value)
+    return 32
+
+
+def _action_of(record: dict):
+    return (record.get("user_registration") or {}).get("action")
+
+
+class MemoryStateBackend:
+    """
+    Keeps conversation records in this process. Records are stored as live objects,
+    so in-place changes are visible immediately and nothing is serialized.
+
+    Idle records expire after a TTL chosen by the conversation's current action, swept by a
+    timing wheel on a background thread. When the entry or byte cap is exceeded the least
+    recently used records are evicted.
+    """
+
+    def __init__(self, idle_ttls: dict = None, max_entries: int = None, max_bytes: int = None,
+                 tick: float = 1.0, slots: int = 512):
+        self._records = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._idle_ttls = idle_ttls or {}
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._wheel = TimingWheel(tick=tick, slots=slots)
+        self._sweeper = None
+        self._resident_bytes = 0
+        self._counters = {"expired": 0, "evicted": 0}
+
+    def load(self, key: str):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+            return record
+
+    def save(self, key: str, record: dict):
+        self._start_sweeper()
+        with self._lock:
+            self._records[key] = record
+            self._records.move_to_end(key)
+            size = estimate_size(record)
+            self._resident_bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+
+            ttl = self._ttl_for(record)
+            if ttl:
+                self._wheel.schedule(key, time.monotonic() + ttl)
+            else:
+                self._wheel.cancel(key)
+            self._evict_over_cap(keep=key)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._records)
+
+    def action_counts(self) -> dict:
+        """Returns {action: number of resident conversations}; records without an action count as "none"."""
+        with self._lock:
+            return dict(Counter(_action_of(record) or "none" for record in self._records.values()))
+
+    def _ttl_for(self, record: dict):
+        action = _action_of(record)
+        return self._idle_ttls.get(action, self._idle_ttls.get("default"))
+
+    def _remove(self, key: str):
+        if self._records.pop(key, None) is not None:
+            self._resident_bytes -= self._sizes.pop(key, 0)
+        self._wheel.cancel(key)
+
+    def _evict_over_cap(self, keep: str):
+        while len(self._records) > 1 and (
+            (self._max_entries and len(self._records) > self._max_entries)
+            or (self._max_bytes and self._resident_bytes > self._max_bytes)
+        ):
+            oldest = next(iter(self._records))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self._counters["evicted"] += 1
+
+    def expire(self, now: float = None) -> int:
+        """Removes records whose idle TTL has passed. Returns how many were removed."""
+        with self._lock:
+            expired = self._wheel.advance(now)
+            for key in expired:
+                self._remove(key)
+            self._counters["expired"] += len(expired)
+        return len(expired)
+
+    def _start_sweeper(self):
+        if self._sweeper is not None or not self._idle_ttls:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep, name="state-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep(self):
+        while True:
+            time.sleep(self._wheel.tick)
+            self.expire()
+
+    def stats(self) -> dict:
+        """Returns resident entries and bytes plus expiry/eviction counters."""
+        with self._lock:
+            return {
+                "entries": len(self._records),
+                "resident_bytes": self._resident_bytes,
+                "scheduled_expiries": len(self._wheel),
+                **self._counters,
+            }
+
+
+class RedisStateBackend:
+    """
+    Keeps conversation records in a Redis-compatible server so every worker process sees the same state.
+    Each user is one msgpack-encoded key, so a write replaces the whole record in a single atomic SET.
+    Any client with get/set/delete/scan_iter works, e.g. fakeredis.FakeRedis() for local testing.
+    A session writes its whole record back when it ends, so two processes handling the same user at once
+    lose one of their updates: the load balancer must route each sender to one process (sticky routing).
+    """
+
+    def __init__(self, client, prefix: str = "chatbot:state:", ttl: int = 86400):
+        if msgpack is None:
+            raise RuntimeError("The redis state backend requires the 'msgpack' package.")
+        self._client = client
+        self._prefix = prefix
+        self._ttl = ttl
+
+    def load(self, key: str):
+        raw = self._client.get(self._prefix + key)
+        return msgpack.unpackb(raw, raw=False) if raw else None
+
+    def save(self, key: str, record: dict):
+        self._client.set(self._prefix + key, msgpack.packb(record, use_bin_type=True), ex=self._ttl)
+
+    def delete(self, key: str):
+        self._client.delete(self._prefix + key)
+
+    def keys(self) -> list:
+        keys = []
+        for raw_key in self._client.scan_iter(match=self._prefix + "*"):
+            raw_key = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+            keys.append(raw_key[len(self._prefix):])
+        return keys
+
+    def action_counts(self, batch: int = 500) -> dict:
+        """Returns {action: number of stored conversations}. Reads every record, so keep it to metrics scrapes."""
+        counts = Counter()
+        raw_keys = list(self._client.scan_iter(match=self._prefix + "*"))
+        for start in range(0, len(raw_keys), batch):
+            for raw in self._client.mget(raw_keys[start:start + batch]):
+                if raw:
+                    counts[_action_of(msgpack.unpackb(raw, raw=False)) or "none"] += 1
+        return dict(counts)
+
+
+class StateStore:
+    """
+    Per-user conversation records, each holding one entry per state namespace.
+    Inside `session(key)` the record is loaded once, handlers mutate it in place,
+    and it is written back to the backend in one operation when the session ends.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._local = threading.local()
+
+    def _sessions(self) -> dict:
+        if not hasattr(self._local, "sessions"):
+            self._local.sessions = {}
+        return self._local.sessions
+
+    @contextmanager
+    def session(self, key: str):
+        sessions = self._sessions()
+        if key in sessions:
+            # Nested session for the same user: the outer one writes back
+            yield sessions[key]
+            return
+
+        record = self.backend.load(key) or {}
+        sessions[key] = record
+        try:
+            yield record
+        finally:
+            record = sessions.pop(key)
+            if record:
+                self.backend.save(key, record)
+            else:
+                self.backend.delete(key)
+
+    def load(self, key: str):
+        sessions = self._sessions()
+        if key in sessions:
+            return sessions[key]
+        return self.backend.load(key)
+
+    def save(self, key: str, record: dict):
+        sessions = self._sessions()
+        if key in sessions:
+            sessions[key] = record
+        elif record:
+            self.backend.save(key, record)
+        else:
+            self.backend.delete(key)
+
+    def keys(self) -> list:
+        return self.backend.keys()
+
+    def stats(self) -> dict:
+        """Returns backend statistics when the backend keeps any."""
+        return self.backend.stats() if hasattr(self.backend, "stats") else {}
+
+    def action_counts(self) -> dict:
+        """Returns {action: number of stored conversations} as seen by the backend."""
+        return self.backend.action_counts()
+
+
+class StateNamespace(MutableMapping):
+    """
+    Dict-like view of one namespace (e.g. user_registration_state) across all user records.
+    """
+
+    def __init__(self, store: StateStore, name: str):
+        self._store = store
+        self._name = name
+
+    def __getitem__(self, key):
+        record = self._store.load(key)
+        if not record or self._name not in record:
+            raise KeyError(key)
+        return record[self._name]
+
+    def __setitem__(self, key, value):
+        record = self._store.load(key) or {}
+        record[self._name] = value
+        self._store.save(key, record)
+
+    def __delitem__(self, key):
+        record = self._store.load(key)
+        if not record or self._name not in record:
+            raise KeyError(key)
+        del record[self._name]
+        self._store.save(key, record)
+
+    def __iter__(self):
+        return (key for key in self._store.keys() if key in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"<StateNamespace {self._name}>"
+
+
+def build_state_store(settings) -> StateStore:
+    """
+    Creates the state store selected by the [state] section of config.ini.
+    """
+    backend = settings.state_backend
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError:
+            redis = None
+        if redis is None or msgpack is None:
+            raise RuntimeError(
+                "[state] backend = redis needs the 'redis' and 'msgpack' packages: pip install -r requirements.txt"
+            )
+        client = redis.Redis.from_url(settings.state_redis_url)
+        return StateStore(RedisStateBackend(client, ttl=settings.state_redis_ttl))
+    if backend == "memory":
+        return StateStore(MemoryStateBackend(
+            idle_ttls=settings.state_idle_ttls,
+            max_entries=settings.state_max_entries,
+            max_bytes=settings.state_max_bytes,
+        ))
+    raise ValueError(f"Unknown state backend: {backend}")
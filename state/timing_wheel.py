@@ -0,0 +1,51 @@
+# state/timing_wheel.py
+
+import time
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel for expiring keys.
+    Scheduling and cancelling are O(1), and each tick only inspects the keys hashed into one slot
+    instead of scanning everything that is tracked. Not thread-safe; callers hold their own lock.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self._slots = [set() for _ in range(slots)]
+        self._deadlines = {}
+        self._last_tick = int(time.monotonic() // tick)
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, key, deadline: float):
+        """(Re)schedules `key` to expire at the monotonic time `deadline`."""
+        self.cancel(key)
+        # A deadline inside a tick that was already swept is picked up on the next one
+        slot = max(int(deadline // self.tick), self._last_tick + 1) % len(self._slots)
+        self._slots[slot].add(key)
+        self._deadlines[key] = (deadline, slot)
+
+    def cancel(self, key):
+        entry = self._deadlines.pop(key, None)
+        if entry is not None:
+            self._slots[entry[1]].discard(key)
+
+    def advance(self, now: float = None) -> list:
+        """Moves the wheel up to `now` and returns the keys whose deadline has passed."""
+        now = time.monotonic() if now is None else now
+        current_tick = int(now // self.tick)
+        # After a long pause every slot is due once; never walk the wheel more than one turn
+        first_tick = max(self._last_tick + 1, current_tick - len(self._slots) + 1)
+        self._last_tick = current_tick
+
+        expired = []
+        for tick in range(first_tick, current_tick + 1):
+            slot = self._slots[tick % len(self._slots)]
+            for key in list(slot):
+                if self._deadlines[key][0] <= now:
+                    slot.discard(key)
+                    del self._deadlines[key]
+                    expired.append(key)
+        return expired
@@ -0,0 +1,242 @@
+# utils/api_client.py
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import get_settings
+from utils.metrics import registry
+from utils.resilience import Bulkhead, BulkheadFullError, CircuitBreaker, CircuitOpenError, RetryBudget
+
+settings = get_settings()
+
+backend_seconds = registry.histogram(
+    "chatbot_backend_request_seconds", "Backend request latency, by config.ini endpoint name.", ("endpoint",)
+)
+backend_errors = registry.counter(
+    "chatbot_backend_errors_total", "Backend requests that failed to connect, timed out or returned a 5xx, by endpoint.", ("endpoint",)
+)
+backend_retries = registry.counter(
+    "chatbot_backend_retries_total", "Failed backend reads, by endpoint and outcome (retried or budget_exhausted).", ("endpoint", "outcome")
+)
+backend_rejected = registry.counter(
+    "chatbot_backend_rejected_total", "Backend calls refused without being sent, by endpoint and reason (circuit_open or bulkhead_full).", ("endpoint", "reason")
+)
+circuit_transitions = registry.counter(
+    "chatbot_circuit_transitions_total", "Circuit breaker state changes, by endpoint and new state.", ("endpoint", "state")
+)
+
+# Methods that are always safe to send twice; POST endpoints that only read are listed in config.ini
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Failed responses worth retrying; other 5xx answers are unlikely to change on a second try
+RETRY_STATUSES = frozenset({502, 503, 504})
+CIRCUIT_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+
+class BackendClient:
+    """
+    Shared HTTP client for the patient-app and db_api endpoints.
+    One keep-alive session per process, addressed by the endpoint names from config.ini,
+    with per-endpoint (connect, read) timeouts and usage statistics.
+
+    Every endpoint also gets a circuit breaker and a bulkhead (a cap on concurrent calls); both refuse a call
+    with a requests.RequestException subclass, so the flows' existing error handling answers the user at once.
+    Reads (GET, or a POST endpoint in `retry_endpoints`) that fail to connect, time out or get a 502/503/504
+    are retried with jittered exponential backoff while the shared retry budget allows.
+    """
+
+    def __init__(self, endpoints: dict, timeouts: dict, pool_maxsize: int = 50, retry_attempts: int = 2,
+                 retry_backoff: float = 0.1, retry_endpoints=(), retry_budget: RetryBudget = None,
+                 breaker_failures: int = 5, breaker_reset: float = 30.0, bulkhead_limits: dict = None,
+                 bulkhead_wait: float = 1.0):
+        self.endpoints = endpoints
+        self.timeouts = timeouts
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.retry_attempts = retry_attempts
+        self.retry_backoff = retry_backoff
+        self.retry_endpoints = frozenset(retry_endpoints)
+        self.retry_budget = retry_budget or RetryBudget()
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.bulkhead_limits = bulkhead_limits or {"default": pool_maxsize}
+        self.bulkhead_wait = bulkhead_wait
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._breakers = {}
+        self._bulkheads = {}
+
+    def url(self, endpoint: str, path: str = None) -> str:
+        """Returns the configured URL for an endpoint, with an optional path suffix."""
+        url = self.endpoints[endpoint]
+        return f"{url}/{path}" if path is not None else url
+
+    def timeout(self, endpoint: str) -> tuple:
+        """Returns the (connect, read) timeout for an endpoint."""
+        return self.timeouts.get(endpoint, self.timeouts["default"])
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        """Returns the endpoint's circuit breaker, created on first use."""
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = self._breakers[endpoint] = CircuitBreaker(
+                    endpoint, self.breaker_failures, self.breaker_reset,
+                    on_transition=lambda name, state: circuit_transitions.inc(endpoint=name, state=state),
+                )
+            return breaker
+
+    def bulkhead(self, endpoint: str) -> Bulkhead:
+        """Returns the endpoint's bulkhead, created on first use."""
+        with self._lock:
+            bulkhead = self._bulkheads.get(endpoint)
+            if bulkhead is None:
+                limit = self.bulkhead_limits.get(endpoint, self.bulkhead_limits["default"])
+                bulkhead = self._bulkheads[endpoint] = Bulkhead(endpoint, limit, self.bulkhead_wait)
+            return bulkhead
+
+    def request(self, method: str, endpoint: str, path: str = None, url: str = None, **kwargs) -> requests.Response:
+        """
+        Sends a request to a named endpoint and records its latency.
+        Pass `url` to reach an address outside config.ini (e.g. Twilio media) under the given endpoint name.
+        Raises CircuitOpenError / BulkheadFullError (both requests.RequestException) when the call is refused.
+        """
+        target = url or self.url(endpoint, path)
+        kwargs.setdefault("timeout", self.timeout(endpoint))
+        retryable = method.upper() in IDEMPOTENT_METHODS or endpoint in self.retry_endpoints
+        self.retry_budget.deposit()
+        response, error = self._attempt(method, endpoint, target, kwargs)
+        attempt = 0
+        while True:
+            failed = error is not None or response.status_code in RETRY_STATUSES
+            if not (failed and retryable and attempt < self.retry_attempts):
+                break
+            if not self.retry_budget.withdraw():
+                backend_retries.inc(endpoint=endpoint, outcome="budget_exhausted")
+                break
+            backend_retries.inc(endpoint=endpoint, outcome="retried")
+            if response is not None:
+                response.close()
+            attempt += 1
+            # Full jitter keeps retries from many callers from arriving together
+            time.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+            try:
+                response, error = self._attempt(method, endpoint, target, kwargs)
+            except (CircuitOpenError, BulkheadFullError) as e:
+                # The failures so far opened the circuit (or the endpoint is saturated): report the refusal
+                response, error = None, e
+                break
+        if error is not None:
+            raise error
+        return response
+
+    def _attempt(self, method: str, endpoint: str, target: str, kwargs: dict) -> tuple:
+        """Sends one request through the endpoint's breaker and bulkhead. Returns (response, None) or (None, error)."""
+        breaker = self.breaker(endpoint)
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            backend_rejected.inc(endpoint=endpoint, reason="circuit_open")
+            raise
+        try:
+            with self.bulkhead(endpoint).slot():
+                start = time.perf_counter()
+                try:
+                    response = self.session.request(method, target, **kwargs)
+                except requests.RequestException as e:
+                    self._record(endpoint, time.perf_counter() - start, error=True)
+                    breaker.record(False)
+                    return None, e
+                except BaseException:
+                    breaker.record(False)
+                    raise
+                success = response.status_code < 500
+                self._record(endpoint, time.perf_counter() - start, error=not success)
+                breaker.record(success)
+                return response, None
+        except BulkheadFullError:
+            # Refused before reaching the backend: not a failure of the endpoint
+            breaker.cancel()
+            backend_rejected.inc(endpoint=endpoint, reason="bulkhead_full")
+            raise
+
+    def get(self, endpoint: str, path: str = None, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, path, **kwargs)
+
+    def post(self, endpoint: str, path: str = None, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, path, **kwargs)
+
+    def put(self, endpoint: str, path: str = None, **kwargs) -> requests.Response:
+        return self.request("PUT", endpoint, path, **kwargs)
+
+    def _record(self, endpoint: str, elapsed: float, error: bool):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {"requests": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+        backend_seconds.observe(elapsed, endpoint=endpoint)
+        if error:
+            backend_errors.inc(endpoint=endpoint)
+
+    def stats(self) -> dict:
+        """
+        Returns per-endpoint request statistics, per-host connection pool usage, circuit states,
+        calls in flight and the retry budget balance.
+        `connections_opened` lower than `requests` means keep-alive connections are being reused.
+        """
+        with self._lock:
+            endpoints = {name: dict(values) for name, values in self._stats.items()}
+
+        pools = {}
+        for key in list(self.adapter.poolmanager.pools.keys()):
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle_connections": pool.pool.qsize() if pool.pool else 0,
+                "max_size": pool.pool.maxsize if pool.pool else 0,
+            }
+        with self._lock:
+            breakers = dict(self._breakers)
+        circuits = {name: breaker.state for name, breaker in breakers.items()}
+        return {"endpoints": endpoints, "pools": pools, "circuits": circuits, "in_flight": self.in_flight(),
+                "retry_tokens": self.retry_budget.tokens}
+
+    def circuit_states(self) -> dict:
+        """Returns {endpoint: 0 closed, 1 half open, 2 open} for the circuit state gauge."""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: CIRCUIT_STATE_VALUES[breaker.state] for name, breaker in breakers.items()}
+
+    def in_flight(self) -> dict:
+        """Returns {endpoint: calls in flight} for the bulkhead gauge."""
+        with self._lock:
+            bulkheads = dict(self._bulkheads)
+        return {name: bulkhead.in_flight for name, bulkhead in bulkheads.items()}
+
+
+# Process-wide client shared by every flow
+backend_client = BackendClient(
+    endpoints=settings.endpoints,
+    timeouts=settings.http_timeouts,
+    pool_maxsize=settings.http_pool_maxsize,
+    retry_attempts=settings.retry_attempts,
+    retry_backoff=settings.retry_backoff,
+    retry_endpoints=settings.retry_endpoints,
+    retry_budget=RetryBudget(settings.retry_budget_ratio, settings.retry_budget_min),
+    breaker_failures=settings.breaker_failures,
+    breaker_reset=settings.breaker_reset,
+    bulkhead_limits=settings.bulkhead_limits,
+    bulkhead_wait=settings.bulkhead_wait,
+)
+registry.gauge("chatbot_circuit_state", "Circuit breaker state per endpoint: 0 closed, 1 half open, 2 open.", ("endpoint",), callback=backend_client.circuit_states)
+registry.gauge("chatbot_backend_in_flight", "Backend calls in flight per endpoint (bounded by its bulkhead).", ("endpoint",), callback=backend_client.in_flight)
@@ -0,0 +1,44 @@
+# utils/fanout.py
+
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import requests
+
+from config import get_settings
+from utils.logger import app_logger as logger
+
+settings = get_settings()
+
+# Shared by every flow; each fan-out only holds these threads for the duration of its backend calls
+_executor = ThreadPoolExecutor(max_workers=settings.fanout_workers, thread_name_prefix="fanout")
+
+
+def fan_out(calls: dict, timeout: float = None) -> dict:
+    """
+    Runs independent backend calls concurrently and waits for all of them under one shared deadline.
+    `calls` maps a name to a zero-argument callable. Returns {name: Future}; every future is finished,
+    so `.result()` returns the value or re-raises the call's exception.
+    Calls still running at the deadline resolve to requests.Timeout, so existing
+    `except requests.RequestException` handlers cover them; they keep running in the background,
+    while calls that had not started yet are cancelled.
+    The callables run on other threads and must not touch conversation state or send messages.
+    """
+    timeout = settings.fanout_timeout if timeout is None else timeout
+    futures = {name: _executor.submit(call) for name, call in calls.items()}
+    _, pending = wait(futures.values(), timeout=timeout)
+
+    for name, future in futures.items():
+        if future in pending:
+            future.cancel()
+            logger.warning(f"Fan-out call {name} did not finish within {timeout}s")
+            futures[name] = Future()
+            futures[name].set_exception(requests.Timeout(f"{name} did not finish within {timeout}s"))
+    return futures
+
+
+def submit(call) -> Future:
+    """
+    Starts one backend call on the fan-out threads and returns its Future, so the caller can do its own work
+    (e.g. a write that must not be cut short by a fan-out deadline) meanwhile. Same rules as fan_out's callables.
+    """
+    return _executor.submit(call)
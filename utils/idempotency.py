@@ -0,0 +1,67 @@
+# utils/idempotency.py
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from utils.logger import app_logger as logger
+from utils.metrics import registry
+
+duplicate_deliveries = registry.counter(
+    "chatbot_webhook_duplicates_total",
+    "Webhook retries answered from the idempotency cache, by whether the original was finished (replayed) or still running (joined).",
+    ("outcome",),
+)
+
+
+class IdempotencyCache:
+    """
+    Runs each keyed unit of work (a Twilio webhook delivery, keyed by MessageSid) at most once.
+    The first delivery starts the work as its own task; retries that arrive while it runs wait for
+    the same task, and retries that arrive later get its stored result. A run that raises (or is cancelled)
+    is dropped once it finishes, so the next retry runs the work again.
+    The task is not tied to the request that started it, so a client disconnect does not abandon
+    work that is already running in a thread and would otherwise be repeated by the retry.
+    Entries are kept for `ttl` seconds, at most `maxsize` of them. Use from the event loop only.
+    """
+
+    def __init__(self, ttl: float = 600, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (expires_at, task), oldest first
+
+    async def run(self, key: str, work):
+        """Returns the outcome of `await work()` for `key`, running it only for the first delivery."""
+        if not key:
+            return await work()
+
+        now = time.monotonic()
+        self._prune(now)
+        entry = self._entries.get(key)
+        if entry is not None:
+            task = entry[1]
+            outcome = "replayed" if task.done() else "joined"
+            duplicate_deliveries.inc(outcome=outcome)
+            logger.info(f"Duplicate delivery of {key} {outcome} the original result.")
+        else:
+            task = asyncio.ensure_future(work())
+            task.add_done_callback(lambda finished: self._finished(key, finished))
+            self._entries[key] = (now + self.ttl, task)
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Future):
+        # Also marks the exception retrieved even if every waiter is gone
+        if task.cancelled() or task.exception() is not None:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is task:
+                del self._entries[key]
+
+    def _prune(self, now: float):
+        while self._entries:
+            expires_at, _ = next(iter(self._entries.values()))
+            if expires_at > now and len(self._entries) < self.maxsize:
+                break
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,225 @@
+# utils/job_queue.py
+
+import json
+import random
+import sqlite3
+import threading
+import time
+
+from utils.logger import app_logger as logger
+from utils.metrics import registry
+
+job_seconds = registry.histogram(
+    "chatbot_job_seconds", "Background job run time, by kind and outcome (done, retry or dead).", ("kind", "outcome")
+)
+job_lag_seconds = registry.histogram(
+    "chatbot_job_lag_seconds", "Time from when a job became due until a worker picked it up.", ("kind",)
+)
+jobs_total = registry.counter(
+    "chatbot_jobs_total", "Background job runs, by kind and outcome (done, retry or dead).", ("kind", "outcome")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    run_at REAL NOT NULL,
+    locked_until REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, run_at);
+"""
+
+
+class JobQueue:
+    """
+    Durable background jobs in a SQLite database (WAL mode), run by a pool of worker threads.
+    A job is a kind plus a JSON payload; the handler registered for the kind raises to have it retried
+    with exponential backoff, and after max_attempts failures the job is kept with status 'dead'.
+    Jobs survive restarts: a job whose worker died is picked up again once its lease expires.
+    A job runs at least once, not exactly once: a failure recorded after a call that did succeed remotely
+    (a timeout, or a result that could not be written) runs it again, so handlers must be idempotent.
+    Several processes may share one database file.
+    """
+
+    def __init__(self, path: str, workers: int = 2, max_attempts: int = 8, backoff: float = 2.0,
+                 backoff_max: float = 600.0, lease: float = 300.0, poll_interval: float = 1.0, name: str = "job-worker"):
+        self._path = path
+        self._workers = max(1, workers)
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._backoff_max = backoff_max
+        self._lease = lease
+        self._poll_interval = poll_interval
+        self._name = name
+        self._handlers = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._running = 0
+        self._schema_ready = False
+
+    def register(self, kind: str, handler):
+        """Registers handler(payload) for jobs of `kind`."""
+        self._handlers[kind] = handler
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; writes that must be atomic open their own BEGIN IMMEDIATE transaction
+            conn = sqlite3.connect(self._path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+        return conn
+
+    def enqueue(self, kind: str, payload: dict, delay: float = 0.0) -> int:
+        """Stores a job and wakes a worker. Returns the job id once the job is on disk."""
+        if kind not in self._handlers:
+            raise KeyError(f"No handler registered for job kind {kind!r}")
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO jobs (kind, payload, created_at, run_at) VALUES (?, ?, ?, ?)",
+            (kind, json.dumps(payload), now, now + delay),
+        )
+        self.start()
+        self._wakeup.set()
+        logger.debug("Queued %s job %s", kind, cursor.lastrowid)
+        return cursor.lastrowid
+
+    def start(self):
+        """Starts the worker threads. Safe to call more than once."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for idx in range(self._workers):
+                thread = threading.Thread(target=self._run, name=f"{self._name}-{idx}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Started {self._workers} {self._name} threads on {self._path}.")
+
+    def _claim(self):
+        """Marks the next due job (or one whose lease expired) as running and returns it, or None."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts, run_at FROM jobs"
+                " WHERE (status = 'pending' AND run_at <= ?) OR (status = 'running' AND locked_until < ?)"
+                " ORDER BY run_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'running', locked_until = ? WHERE id = ?", (now + self._lease, row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.error(f"{self._name} could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self._poll_interval)
+                self._wakeup.clear()
+                continue
+            with self._lock:
+                self._running += 1
+            try:
+                self._execute(*job)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def _execute(self, job_id: int, kind: str, payload: str, attempts: int, run_at: float):
+        job_lag_seconds.observe(max(time.time() - run_at, 0.0), kind=kind)
+        started = time.perf_counter()
+        try:
+            handler = self._handlers[kind]
+            handler(json.loads(payload))
+        except Exception as e:
+            attempts += 1
+            outcome = "dead" if attempts >= self._max_attempts else "retry"
+            delay = min(self._backoff_max, self._backoff ** attempts) * random.uniform(0.5, 1.0)
+            if outcome == "dead":
+                logger.error(f"{kind} job {job_id} failed {attempts} times, giving up: {e}")
+            else:
+                logger.warning(f"{kind} job {job_id} failed (attempt {attempts}), retrying in {delay:.1f}s: {e}")
+            statement = (
+                "UPDATE jobs SET status = ?, attempts = ?, run_at = ?, locked_until = NULL, last_error = ? WHERE id = ?",
+                ("dead" if outcome == "dead" else "pending", attempts, time.time() + delay, str(e)[:1000], job_id),
+            )
+        else:
+            outcome = "done"
+            statement = ("DELETE FROM jobs WHERE id = ?", (job_id,))
+        try:
+            self._conn().execute(*statement)
+        except sqlite3.Error as e:
+            # The job keeps its lease and runs again once it expires
+            logger.error(f"{self._name} could not record {kind} job {job_id} as {outcome}: {e}")
+        job_seconds.observe(time.perf_counter() - started, kind=kind, outcome=outcome)
+        jobs_total.inc(kind=kind, outcome=outcome)
+
+    def counts(self) -> dict:
+        """Returns {status: number of jobs} (pending, running, dead)."""
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def oldest_due_age(self) -> float:
+        """Seconds the longest-waiting due job has been due; 0 when nothing is waiting."""
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT MIN(run_at) FROM jobs WHERE status = 'pending' AND run_at <= ?", (now,)
+        ).fetchone()
+        return max(now - row[0], 0.0) if row[0] is not None else 0.0
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """Waits until no job is due or running. Jobs waiting out a retry delay do not count. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.time()
+            row = self._conn().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'running' OR (status = 'pending' AND run_at <= ?)", (now,)
+            ).fetchone()
+            if row[0] == 0 and self._running == 0:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            self._wakeup.set()
+            time.sleep(0.01)
+
+    def stop(self, timeout: float = 10.0):
+        """Finishes the due jobs (up to `timeout`) and stops the workers; the rest stay on disk for the next start."""
+        if self._threads and not self.drain(timeout):
+            logger.warning(f"{self._name} stopped with {self.counts().get('pending', 0)} jobs pending.")
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in threads:
+            thread.join(timeout=1.0)
+
+    def stats(self) -> dict:
+        """Returns job counts by status, the oldest due job's age and the number of jobs running in this process."""
+        stats = {status: 0 for status in ("pending", "running", "dead")}
+        stats.update(self.counts())
+        stats["oldest_due_seconds"] = self.oldest_due_age()
+        stats["in_process"] = self._running
+        return stats
@@ -0,0 +1,59 @@
+# utils/keyed_lock.py
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from utils.metrics import registry
+
+lock_wait_seconds = registry.histogram(
+    "chatbot_user_lock_wait_seconds", "Time a message waited for the previous message of the same user to finish."
+)
+
+
+class KeyedLock:
+    """
+    One FIFO asyncio lock per key, created on first use and dropped when nobody holds or waits for it.
+    Holders of the same key run one at a time in the order they asked; different keys never wait on each other.
+    Use from the event loop only.
+    """
+
+    def __init__(self):
+        self._locks = {}  # key -> [asyncio.Lock, holders + waiters]
+        self._stats = {"acquired": 0, "contended": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+
+    @asynccontextmanager
+    async def hold(self, key: str):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        contended = entry[1] > 1
+        started = time.perf_counter()
+        try:
+            async with entry[0]:
+                self._record(time.perf_counter() - started, contended)
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def _record(self, waited: float, contended: bool):
+        lock_wait_seconds.observe(waited)
+        self._stats["acquired"] += 1
+        self._stats["contended"] += int(contended)
+        self._stats["wait_seconds_total"] += waited
+        self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+    def waiting(self) -> int:
+        """Number of callers queued behind another holder of the same key."""
+        return sum(max(count - 1, 0) for _, count in self._locks.values())
+
+    def stats(self) -> dict:
+        """Returns acquisition and wait-time counters plus the current number of keys and waiters."""
+        stats = dict(self._stats)
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / stats["acquired"] if stats["acquired"] else 0.0
+        stats["keys"] = len(self._locks)
+        stats["waiting"] = self.waiting()
+        return stats
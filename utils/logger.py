@@ -1,26 +1,167 @@
 # utils/logger.py
 
+import atexit
+import json
 import logging
+import queue
+import random
+from collections.abc import MappingView
+from logging.handlers import QueueHandler, QueueListener
 
-def setup_logger(name, level=logging.INFO):
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+QUEUE_SIZE = 10000
+MAX_FIELD_CHARS = 2000
+MAX_ITEMS = 100
+MAX_DEPTH = 6
+
+
+def redact(value, max_chars: int = MAX_FIELD_CHARS, depth: int = MAX_DEPTH):
     """
-    Set up a logger with the specified name and level.
-    Logs messages to the console with a specific format.
+    Returns a copy of a log argument that is cheap and safe to format later on another thread:
+    binary payloads and file objects become placeholders, long strings and containers are truncated,
+    and containers are copied so later changes to conversation state do not leak into the log line.
     """
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    
-    console_handler = logging.StreamHandler()  # Create a console handler
-    console_handler.setFormatter(formatter)
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else f"{value[:max_chars]}...<{len(value) - max_chars} more chars>"
+    if hasattr(value, "read"):
+        return f"<{type(value).__name__}>"
+    if isinstance(value, (dict, list, tuple, set, frozenset, MappingView)):
+        if depth <= 0:
+            return f"<{type(value).__name__} of {len(value)}>"
+        items = list(value.items() if isinstance(value, dict) else value)
+        extra = len(items) - MAX_ITEMS
+        items = items[:MAX_ITEMS]
+        if isinstance(value, dict):
+            copied = {key: redact(item, max_chars, depth - 1) for key, item in items}
+            if extra > 0:
+                copied["..."] = f"<{extra} more keys>"
+            return copied
+        copied = [redact(item, max_chars, depth - 1) for item in items]
+        if extra > 0:
+            copied.append(f"<{extra} more items>")
+        return tuple(copied) if isinstance(value, tuple) else copied
+    return value
+
+
+class DebugSampler(logging.Filter):
+    """
+    Keeps a fraction of DEBUG records; other levels always pass.
+    Rates are looked up by module name (e.g. self_booking), then logger name, then "default".
+    """
+
+    def __init__(self, rates: dict = None):
+        super().__init__()
+        self.rates = dict(rates or {})
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or not self.rates:
+            return True
+        rate = self.rates.get(record.module, self.rates.get(record.name, self.rates.get("default", 1.0)))
+        return rate >= 1.0 or random.random() < rate
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Hands records to a QueueListener thread without formatting them on the calling thread.
+    Only the arguments are made safe (see redact); the message is built and written by the listener.
+    When the queue is full records are dropped and counted instead of blocking the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue, max_chars: int = MAX_FIELD_CHARS):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+        self.dropped = 0
+        self.sampler = DebugSampler()
+        self.addFilter(self.sampler)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not record.args:
+            # Already formatted by the caller (f-string): only the length can be capped
+            record.msg = redact(record.msg, self.max_chars)
+        elif isinstance(record.args, tuple):
+            record.args = tuple(redact(arg, self.max_chars) for arg in record.args)
+        elif record.args:
+            record.args = redact(record.args, self.max_chars)
+        if record.exc_info:
+            # Tracebacks reference live frames, so render them before the record changes threads
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, module, thread and message (plus exc when present)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _formatter(log_format: str) -> logging.Formatter:
+    return JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+
+
+def setup_logger(name, level=logging.INFO, log_format="json"):
+    """
+    Set up a logger with the specified name and level.
+    Records are queued by the calling thread and formatted and written to the console
+    by a background listener thread, as JSON lines or as plain text.
+    """
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
     # Avoid adding duplicate handlers
-    if not logger.hasHandlers():
-        logger.addHandler(console_handler)
+    if logger.hasHandlers():
+        return logger
 
+    console_handler = logging.StreamHandler()  # Create a console handler
+    console_handler.setFormatter(_formatter(log_format))
+
+    queue_handler = AsyncQueueHandler(queue.Queue(QUEUE_SIZE))
+    queue_handler.listener = QueueListener(queue_handler.queue, console_handler, respect_handler_level=True)
+    queue_handler.listener.start()
+    atexit.register(queue_handler.listener.stop)
+
+    logger.addHandler(queue_handler)
     return logger
 
+
+def configure_logging(settings, logger=None):
+    """
+    Applies the [logging] and [log_sampling] sections of config.ini to a logger made by setup_logger
+    (app_logger by default). Called once the configuration is loaded, since config.py itself logs.
+    """
+    logger = logger or app_logger
+    logger.setLevel(settings.log_level.upper())
+    for handler in logger.handlers:
+        if isinstance(handler, AsyncQueueHandler):
+            handler.max_chars = settings.log_max_field_chars
+            handler.sampler.rates = dict(settings.log_sample_rates)
+            for target in handler.listener.handlers:
+                target.setFormatter(_formatter(settings.log_format))
+
+
 # Pre-configured logger instance for the application
 app_logger = setup_logger('app_logger', level=logging.DEBUG)
 app_logger.info('Logger initialized')
@@ -0,0 +1,139 @@
+# utils/message_dispatcher.py
+
+import itertools
+import queue
+import threading
+import time
+import zlib
+
+from utils.logger import app_logger as logger
+from utils.metrics import registry
+
+# Send priority classes: lower goes first when sends compete for a worker or the rate limit
+PRIORITY_HIGH = 0    # booking confirmations and errors
+PRIORITY_NORMAL = 1  # the next question of a flow
+PRIORITY_LOW = 2     # menus re-sent after an invalid choice
+PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_NORMAL: "normal", PRIORITY_LOW: "low"}
+
+queue_wait_seconds = registry.histogram(
+    "chatbot_twilio_queue_wait_seconds", "Time an outbound message waited in the dispatcher queue, by priority.", ("priority",)
+)
+
+
+class MessageDispatcher:
+    """
+    Sends outbound messages from a pool of background worker threads.
+    Every recipient is pinned to one worker, so messages to the same number
+    go out in the order they were queued while different numbers send in parallel.
+    Each worker sends its most urgent recipient first; a message never overtakes an earlier one to the
+    same number, it takes that message's priority instead when it is less urgent.
+    """
+
+    def __init__(self, send, workers: int = 4, name: str = "message-dispatcher"):
+        self._send = send
+        self._name = name
+        self._queues = [queue.PriorityQueue() for _ in range(max(1, workers))]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._order = itertools.count()
+        self._pending = {}  # recipient -> [priority of its last queued message, messages queued]
+        self._stats = {
+            "sent": 0,
+            "failed": 0,
+            "send_seconds_total": 0.0,
+            "send_seconds_max": 0.0,
+            "wait_seconds_total": 0.0,
+        }
+
+    def start(self):
+        """Starts the worker threads. Safe to call more than once."""
+        with self._lock:
+            if self._threads:
+                return
+            for idx, work_queue in enumerate(self._queues):
+                thread = threading.Thread(target=self._run, args=(work_queue,), name=f"{self._name}-{idx}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Started {len(self._threads)} {self._name} workers.")
+
+    def submit(self, to: str, message: dict, priority: int = PRIORITY_NORMAL):
+        """Queues a message for `to`. `message` holds the keyword arguments for the send function."""
+        self.start()
+        shard = zlib.crc32(to.encode()) % len(self._queues)
+        with self._lock:
+            pending = self._pending.get(to)
+            if pending is None:
+                pending = self._pending[to] = [priority, 0]
+            # Never ahead of an earlier message to the same number
+            pending[0] = max(pending[0], priority)
+            pending[1] += 1
+            self._queues[shard].put((pending[0], next(self._order), to, message, priority, time.perf_counter()))
+
+    def _done(self, to: str):
+        with self._lock:
+            pending = self._pending[to]
+            pending[1] -= 1
+            if pending[1] == 0:
+                del self._pending[to]
+
+    def _run(self, work_queue: queue.PriorityQueue):
+        while True:
+            _, _, to, message, priority, queued_at = work_queue.get()
+            if to is None:
+                work_queue.task_done()
+                return
+
+            started = time.perf_counter()
+            queue_wait_seconds.observe(started - queued_at, priority=PRIORITY_NAMES.get(priority, str(priority)))
+            try:
+                sent = self._send(to, message)
+            except Exception as e:
+                logger.error(f"Unexpected error while sending message to {to}: {e}")
+                sent = False
+            finally:
+                self._done(to)
+                self._record(sent, time.perf_counter() - started, started - queued_at)
+                work_queue.task_done()
+
+    def _record(self, sent: bool, send_seconds: float, wait_seconds: float):
+        with self._lock:
+            self._stats["sent" if sent else "failed"] += 1
+            self._stats["send_seconds_total"] += send_seconds
+            self._stats["send_seconds_max"] = max(self._stats["send_seconds_max"], send_seconds)
+            self._stats["wait_seconds_total"] += wait_seconds
+
+    def queue_depth(self) -> int:
+        """Number of messages queued or being sent."""
+        return sum(work_queue.unfinished_tasks for work_queue in self._queues)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Waits until every queued message has been handled. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.queue_depth() > 0:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout: float = 10.0):
+        """Drains the queues and stops the workers."""
+        if not self.flush(timeout):
+            logger.warning(f"{self._name} stopped with {self.queue_depth()} messages still queued.")
+        with self._lock:
+            threads, self._threads = self._threads, []
+            if threads:
+                for work_queue in self._queues:
+                    # Sorts after every message still queued
+                    work_queue.put((float("inf"), next(self._order), None, None, None, 0.0))
+        for thread in threads:
+            thread.join(timeout=1.0)
+
+    def stats(self) -> dict:
+        """Returns send counts, send latency and the current queue depth."""
+        with self._lock:
+            stats = dict(self._stats)
+        handled = stats["sent"] + stats["failed"]
+        stats["send_seconds_avg"] = stats["send_seconds_total"] / handled if handled else 0.0
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / handled if handled else 0.0
+        stats["queue_depth"] = self.queue_depth()
+        return stats
@@ -1,49 +1,186 @@
 # utils/messaging_utils.py
 
+import contextvars
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
+from twilio.twiml.messaging_response import MessagingResponse
 from utils.logger import app_logger as logger
-from config import load_config
+from utils.message_dispatcher import MessageDispatcher, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW, PRIORITY_NAMES
+from utils.metrics import registry
+from utils.rate_limiter import TokenBucket
+from config import load_config, get_settings
 import json
+import random
+import time
 
 
 # Load Twilio configuration
 config = load_config()
+settings = get_settings()
 
-account_sid = config['account_sid']
-auth_token = config['auth_token']
-twilio_whatsapp_number = config['phone_number']
+account_sid = settings.account_sid
+auth_token = settings.auth_token
+twilio_whatsapp_number = settings.phone_number
 
 # External api configs
 
 patient_list_api = config['fetch_pt_list']
 
-# Initialize Twilio Client
-client = Client(account_sid, auth_token)
+# Initialize the process-wide Twilio Client on a keep-alive session sized for the send workers
+twilio_http_client = TwilioHttpClient(pool_connections=True, timeout=settings.send_timeout)
+twilio_http_client.session.mount("https://", HTTPAdapter(pool_maxsize=settings.send_workers))
+client = Client(account_sid, auth_token, http_client=twilio_http_client)
+
+twilio_send_seconds = registry.histogram(
+    "chatbot_twilio_send_seconds", "Twilio message create latency, by result (sent or failed).", ("result",)
+)
+text_replies = registry.counter(
+    "chatbot_text_replies_total", "Texts collected for a TwiML reply, by how they went out (twiml, or rest when a template followed them).", ("via",)
+)
+
+rate_limit_wait_seconds = registry.histogram(
+    "chatbot_twilio_rate_limit_wait_seconds", "Time a send waited for the outbound rate limit, by priority.", ("priority",)
+)
+twilio_throttled = registry.counter(
+    "chatbot_twilio_throttled_total", "Sends Twilio answered with 429 Too Many Requests, by outcome (retried or dropped).", ("outcome",)
+)
+
+# Every send from this process shares the sender number's throughput
+send_limiter = TokenBucket(settings.send_rate, settings.send_burst)
+registry.gauge("chatbot_twilio_rate_limit_waiting", "Sends waiting for the outbound rate limit.", callback=send_limiter.waiting)
 
-def send_whatsapp_message(to: str, body: str = None, content_sid: str = None, content_variables: dict = None) -> bool:
+
+def _create(to: str, message: dict):
+    if message.get("content_sid"):
+        client.messages.create(
+            from_=twilio_whatsapp_number,
+            content_sid=message["content_sid"],
+            content_variables=json.dumps(message["content_variables"]) if message.get("content_variables") else None,
+            to=to
+        )
+    else:
+        client.messages.create(
+            body=message.get("body"),
+            from_=twilio_whatsapp_number,
+            to=to
+        )
+
+
+def _deliver(to: str, message: dict) -> bool:
     """
-    Sends a WhatsApp message using Twilio.
-    add_pt_cta"""
-    try:
-        if content_sid:
-            client.messages.create(
-                from_=twilio_whatsapp_number,
-                content_sid=content_sid,
-                content_variables=json.dumps(content_variables) if content_variables else None,
-                to=to
-            )
-        else:
-            client.messages.create(
-                body=body,
-                from_=twilio_whatsapp_number,
-                to=to
-            )
-        logger.info(f"Message sent successfully to {to}")
+    Sends one message through the Twilio REST API within the outbound rate limit.
+    A 429 from Twilio pauses every send for a jittered, growing delay and retries the message.
+    """
+    priority = message.get("priority", PRIORITY_NORMAL)
+    for attempt in range(settings.send_retries + 1):
+        waited = send_limiter.acquire(priority)
+        rate_limit_wait_seconds.observe(waited, priority=PRIORITY_NAMES.get(priority, str(priority)))
+        started = time.perf_counter()
+        try:
+            _create(to, message)
+            twilio_send_seconds.observe(time.perf_counter() - started, result="sent")
+            logger.info(f"Message sent successfully to {to}")
+            return True
+        except TwilioRestException as e:
+            twilio_send_seconds.observe(time.perf_counter() - started, result="failed")
+            if e.status != 429 or attempt == settings.send_retries:
+                if e.status == 429:
+                    twilio_throttled.inc(outcome="dropped")
+                logger.error(f"Failed to send message to {to}: {e}")
+                return False
+            delay = min(30.0, 2.0 ** attempt) * random.uniform(0.5, 1.0)
+            twilio_throttled.inc(outcome="retried")
+            logger.warning(f"Twilio rate limited the message to {to}, retrying in {delay:.1f}s")
+            send_limiter.pause(delay)
+        except Exception as e:
+            twilio_send_seconds.observe(time.perf_counter() - started, result="failed")
+            logger.error(f"Failed to send message to {to}: {e}")
+            return False
+
+
+# Background sender shared by every flow
+dispatcher = MessageDispatcher(_deliver, workers=settings.send_workers, name="twilio-sender")
+registry.gauge("chatbot_twilio_queue_depth", "Outbound messages queued or being sent.", callback=dispatcher.queue_depth)
+
+
+def _send(to: str, message: dict) -> bool:
+    if settings.background_send:
+        dispatcher.submit(to, message, message["priority"])
         return True
-    except Exception as e:
-        logger.error(f"Failed to send message to {to}: {e}")
-        return False
-    
+    return _deliver(to, message)
+
+
+class ReplyCollector:
+    """
+    Text replies to the sender of the webhook being handled, returned as TwiML <Message> elements
+    in the webhook response instead of one REST call each.
+    A content template can only go out through the REST API; before the first one, the texts collected so far
+    are sent through REST as well, and every later message of the request follows them, so the user sees them in order.
+    """
+
+    def __init__(self, to: str):
+        self.to = to
+        self.replies = []
+        self.flushed = False
+
+    def flush(self):
+        """Sends the collected texts through the REST API; later messages skip the collector."""
+        if not self.flushed:
+            self.flushed = True
+            for body, priority in self.replies:
+                _send(self.to, {"body": body, "content_sid": None, "content_variables": None, "priority": priority})
+            text_replies.inc(len(self.replies), via="rest")
+            self.replies = []
+
+    def twiml(self) -> str:
+        response = MessagingResponse()
+        for body, _ in self.replies:
+            response.message(body)
+        text_replies.inc(len(self.replies), via="twiml")
+        return str(response)
+
+
+_reply_collector = contextvars.ContextVar("reply_collector", default=None)
+
+
+@contextmanager
+def collect_replies(to: str):
+    """
+    Collects the text messages sent to `to` inside the block (see ReplyCollector) and yields the collector.
+    If the block raises, the collected texts are sent through the REST API so the user still gets them.
+    """
+    collector = ReplyCollector(to)
+    token = _reply_collector.set(collector)
+    try:
+        yield collector
+    except BaseException:
+        collector.flush()
+        raise
+    finally:
+        _reply_collector.reset(token)
+
+
+def send_whatsapp_message(to: str, body: str = None, content_sid: str = None, content_variables: dict = None,
+                          priority: int = PRIORITY_NORMAL) -> bool:
+    """
+    Sends a WhatsApp text or content-template message using Twilio.
+    With background sending enabled the message is queued and sent in order by the dispatcher;
+    the return value then only says it was accepted.
+    `priority` (PRIORITY_HIGH / NORMAL / LOW) decides which sends go first when the rate limit is reached.
+    Inside collect_replies(), texts to the webhook's sender are kept for the TwiML response instead.
+    """
+    collector = _reply_collector.get()
+    if collector is not None and to == collector.to:
+        if not content_sid and not collector.flushed:
+            collector.replies.append((body, priority))
+            return True
+        collector.flush()
+    return _send(to, {"body": body, "content_sid": content_sid, "content_variables": content_variables, "priority": priority})
+
 
 def clean_mobile_number_for_api(mobile: str) -> str:
     """Cleans the mobile number for external APIs (10 digits only)."""
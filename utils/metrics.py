@@ -0,0 +1,171 @@
+# utils/metrics.py
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(label, "")) for label in self.labelnames)
+        return self._values.get(key, 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Gauge:
+    """
+    Value that can go up and down, optionally split by labels.
+    With a `callback` the value is read at render time: the callback returns a number,
+    or {label value (a tuple for several labels): number} when the gauge has labels.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> list:
+        if self.callback is None:
+            with self._lock:
+                items = list(self._values.items())
+        elif self.labelnames:
+            items = [(key if isinstance(key, tuple) else (key,), value) for key, value in self.callback().items()]
+        else:
+            items = [((), self.callback())]
+        return [(self.name, dict(zip(self.labelnames, map(str, key))), value) for key, value in items]
+
+
+class Histogram:
+    """Distribution of observed values (seconds by convention) in cumulative buckets, optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the `with` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = [(key, list(series["counts"]), series["sum"], series["count"]) for key, series in self._series.items()]
+
+        samples = []
+        for key, counts, total, count in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class Registry:
+    """Holds every metric of the process and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by every module
+registry = Registry()
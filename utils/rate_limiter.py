@@ -0,0 +1,136 @@
+# utils/rate_limiter.py
+
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` acquisitions per second with bursts of up to `burst`.
+    Callers waiting for a token are served by priority (lower first), then in arrival order.
+    A rate of 0 or less disables the limit.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = max(1.0, burst if burst is not None else rate)
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, ticket number)
+        self._tickets = itertools.count()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority: int = 0) -> float:
+        """Blocks until this caller may proceed and returns the seconds it waited."""
+        if self.rate <= 0 and self._paused_until <= time.monotonic():
+            return 0.0
+        started = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._tickets))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._waiters[0] != ticket:
+                        self._cond.wait()
+                        continue
+                    wait = self._paused_until - now
+                    if self.rate > 0:
+                        self._refill(now)
+                        wait = max(wait, (1.0 - self._tokens) / self.rate)
+                    if wait <= 0:
+                        if self.rate > 0:
+                            self._tokens -= 1.0
+                        return time.monotonic() - started
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Holds every caller for `seconds`, e.g. after the remote side answered 429 Too Many Requests."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def waiting(self) -> int:
+        """Number of callers waiting for a token."""
+        with self._cond:
+            return len(self._waiters)
+
+
+class SlidingWindowLimiter:
+    """
+    Per-key sliding-window limit: at most `limit` events in any `window` seconds.
+    The window is estimated from two fixed windows (the current count plus the previous count weighted by how much
+    of it still overlaps), so a key costs a handful of integers. At most `max_keys` keys are kept, least recently seen
+    dropped first. Refused events are not counted against the key. Use from the event loop only.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = 100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._entries = OrderedDict()  # key -> [window number, count, previous count, refused, notified window]
+        self._refused = 0
+
+    def _entry(self, key, now: float) -> tuple:
+        current = int(now // self.window)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [current, 0, 0, 0, -1]
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        elif entry[0] != current:
+            # The previous window only counts when it is the one right before this one
+            entry[2] = entry[1] if entry[0] == current - 1 else 0
+            entry[0], entry[1] = current, 0
+        self._entries.move_to_end(key)
+        return entry, now / self.window - current
+
+    def hit(self, key, now: float = None) -> bool:
+        """Records an event for `key` and returns True, or returns False when the key is over its limit."""
+        entry, elapsed = self._entry(key, time.monotonic() if now is None else now)
+        if entry[2] * (1.0 - elapsed) + entry[1] < self.limit:
+            entry[1] += 1
+            return True
+        entry[3] += 1
+        self._refused += 1
+        return False
+
+    def retry_after(self, key, now: float = None) -> float:
+        """Seconds until `key` may have another event."""
+        entry, elapsed = self._entry(key, time.monotonic() if now is None else now)
+        current, previous = entry[1], entry[2]
+        if current < self.limit:
+            # Wait for enough of the previous window to slide out
+            if previous * (1.0 - elapsed) + current < self.limit:
+                return 0.0
+            return (1.0 - (self.limit - current) / previous - elapsed) * self.window
+        # Wait for the next window, then for enough of this one to slide out
+        return (1.0 - elapsed + 1.0 - self.limit / current) * self.window
+
+    def notify_once(self, key, now: float = None) -> bool:
+        """True the first time it is called for `key` in a window, e.g. to send a single "please wait" reply."""
+        entry, _ = self._entry(key, time.monotonic() if now is None else now)
+        if entry[4] == entry[0]:
+            return False
+        entry[4] = entry[0]
+        return True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self, top: int = 5) -> dict:
+        """Returns the keys tracked, events refused, and the keys refused most often."""
+        offenders = sorted(((entry[3], key) for key, entry in self._entries.items() if entry[3]), reverse=True)[:top]
+        return {"keys": len(self._entries), "refused": self._refused, "top_refused": {key: count for count, key in offenders}}
@@ -0,0 +1,153 @@
+# utils/resilience.py
+
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from utils.logger import app_logger as logger
+
+
+class BackendUnavailableError(requests.RequestException):
+    """Raised without contacting the endpoint, because it is failing or already saturated."""
+
+
+class CircuitOpenError(BackendUnavailableError):
+    """The endpoint's circuit breaker is open."""
+
+
+class BulkheadFullError(BackendUnavailableError):
+    """Every concurrent-call slot of the endpoint stayed busy for the whole wait."""
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker. After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast with CircuitOpenError; after `reset_timeout` seconds one probe call is let through (half open),
+    and its result closes or reopens the circuit. `on_transition(name, state)` is called on every state change.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0, on_transition=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._on_transition = on_transition
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def before_call(self):
+        """Raises CircuitOpenError unless a call may go out now."""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuit for {self.name} is open")
+                self._transition(self.HALF_OPEN)
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(f"Circuit for {self.name} is half open, a probe call is in flight")
+                self._probing = True
+
+    def record(self, success: bool):
+        """Records the result of a call allowed by before_call()."""
+        with self._lock:
+            probe, self._probing = self._probing, False
+            if success:
+                self._failures = 0
+                if self._state == self.HALF_OPEN:
+                    self._transition(self.CLOSED)
+                return
+            self._failures += 1
+            if (probe and self._state == self.HALF_OPEN) or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+    def cancel(self):
+        """Releases a call allowed by before_call() that never went out."""
+        with self._lock:
+            self._probing = False
+
+    def _transition(self, state: str):
+        previous, self._state = self._state, state
+        log = logger.warning if state == self.OPEN else logger.info
+        log(f"Circuit for {self.name}: {previous} -> {state}")
+        if self._on_transition:
+            self._on_transition(self.name, state)
+
+
+class Bulkhead:
+    """
+    Caps the concurrent calls to one endpoint. A caller waits up to `wait` seconds for a free slot,
+    then gets BulkheadFullError, so a slow endpoint cannot hold every worker thread.
+    """
+
+    def __init__(self, name: str, limit: int, wait: float = 1.0):
+        self.name = name
+        self.limit = limit
+        self.wait = wait
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @contextmanager
+    def slot(self):
+        if not self._semaphore.acquire(timeout=self.wait):
+            raise BulkheadFullError(f"{self.name} already has {self.limit} calls in flight")
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+
+class RetryBudget:
+    """
+    Limits retries to a fraction of the traffic: every request deposits `ratio` tokens, every retry spends one.
+    `min_per_second` tokens are added over time so low traffic can still retry; the balance never exceeds `max_tokens`.
+    Keeps retries from multiplying the load on an endpoint that is already failing.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+
+    def _refill(self, amount: float):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + amount + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        """Spends one token for a retry. Returns False when the budget is exhausted."""
+        with self._lock:
+            self._refill(0.0)
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(0.0)
+            return self._tokens
@@ -0,0 +1,99 @@
+# utils/startup_report.py
+
+import os
+import sys
+import time
+from importlib.machinery import PathFinder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _TimedLoader:
+    """Wraps a module loader and records how long executing the module takes."""
+
+    def __init__(self, loader, name: str, timer):
+        self._loader = loader
+        self._name = name
+        self._timer = timer
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._timer._enter(self._name)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer._exit(self._name)
+
+    def __getattr__(self, attr):
+        # get_source, get_filename, ... used by tracebacks and tooling
+        return getattr(self._loader, attr)
+
+
+class StartupTimer:
+    """
+    Times the import of this project's modules (anything under the repository root).
+    Each module gets its inclusive time and its self time, which excludes the project modules it imports;
+    third-party imports count towards the project module that imported them.
+    """
+
+    def __init__(self, root: str = ROOT):
+        self.root = root
+        self.started = None
+        self.finished = None
+        self._stack = []
+        self._timings = {}
+        self._project_seconds = 0.0
+
+    # Meta path finder protocol
+    def find_spec(self, name, path=None, target=None):
+        spec = PathFinder.find_spec(name, path, target)
+        if spec is None or not spec.origin or not spec.origin.startswith(self.root) or "site-packages" in spec.origin:
+            return None
+        spec.loader = _TimedLoader(spec.loader, name, self)
+        return spec
+
+    def install(self):
+        """Starts timing; call before the first project import."""
+        self.started = time.perf_counter()
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        """Stops timing once every module is imported."""
+        self.finished = time.perf_counter()
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def _enter(self, name: str):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self, name: str):
+        _, started, children = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        self._timings[name] = (elapsed, elapsed - children)
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        else:
+            self._project_seconds += elapsed
+
+    def timings(self) -> dict:
+        """Returns {module: (inclusive_seconds, self_seconds)}."""
+        return dict(self._timings)
+
+    def report(self, top: int = 15) -> str:
+        """Formats the slowest modules by self time, plus the total startup time."""
+        total = ((self.finished or time.perf_counter()) - self.started) if self.started else 0.0
+        lines = [
+            f"Startup took {total * 1000:.1f} ms: {self._project_seconds * 1000:.1f} ms in {len(self._timings)} project modules, "
+            f"{(total - self._project_seconds) * 1000:.1f} ms in third-party imports. Slowest modules (inclusive / self ms):"
+        ]
+        slowest = sorted(self._timings.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for name, (inclusive, own) in slowest:
+            lines.append(f"  {name:<40} {inclusive * 1000:8.1f} {own * 1000:8.1f}")
+        return "\n".join(lines)
+
+
+# Process-wide timer; app.py installs it before importing the flows
+startup_timer = StartupTimer()
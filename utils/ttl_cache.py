@@ -0,0 +1,58 @@
+# utils/ttl_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe cache whose entries expire `ttl` seconds after they were stored.
+    Holds at most `maxsize` entries; the least recently used entry is dropped first.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, key, default=None):
+        """Returns the cached value for `key`, or `default` when it is missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[1] <= now:
+                if entry is not _MISSING:
+                    del self._entries[key]
+                self._stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def set(self, key, value, ttl: float = None):
+        """Stores `value` under `key`, optionally with a TTL other than the cache default."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Removes `key` so the next lookup goes back to the source."""
+        with self._lock:
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self._stats["invalidations"] += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Returns hit/miss/invalidation counts and the current number of entries."""
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}